@@ -0,0 +1 @@
+"""Core logic for Your Care Pal, importable without the Streamlit UI."""
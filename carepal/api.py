@@ -0,0 +1,140 @@
+"""Headless JSON API over the same pipeline as the Streamlit UI.
+
+A plain ASGI app with no framework, for kiosks, SMS gateways and anything
+else that wants answers without a browser session. Run it with any ASGI
+server, several workers behind a load balancer if needed:
+
+    uvicorn carepal.api:app --host 0.0.0.0 --port 8000 --workers 4
+
+Endpoints:
+
+- ``POST /v1/triage`` ``{"message": ...}``: classification flags and the rule-based answer
+- ``POST /v1/chat`` ``{"message": ..., "persona": ..., "history": [...], "user_name": ..., "session_id": ...}``:
+  the full reply, AI included when configured; ``history`` holds earlier
+  ``{"role", "content"}`` turns and ``user_name`` is echoed back for the next call.
+  ``session_id`` puts the conversation under the per-session rate limit (see
+  ``carepal.ratelimit``); without it only the process-wide limit applies,
+  since kiosks and SMS gateways often send many users from one address. A
+  shed request comes back with branch ``shed`` and the rule-based answer
+- ``GET /healthz``: liveness plus whether the AI is available
+- ``GET /metrics``: Prometheus metrics when ``CAREPAL_METRICS=1`` (see ``carepal.metrics``)
+"""
+import json
+from typing import Dict, List, Optional, Tuple, Union
+
+from carepal import metrics
+from carepal.llm import llm_available, llm_circuit_open, warm_up
+from carepal.pipeline import DEFAULT_MODEL, respond_async, triage
+from carepal.prompts import PERSONAS
+
+MAX_BODY_BYTES = 64 * 1024
+MAX_MESSAGE_CHARS = 4000
+DEFAULT_PERSONA = next(iter(PERSONAS))
+
+
+class HTTPError(Exception):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+async def _read_body(receive) -> bytes:
+    body = b""
+    while True:
+        event = await receive()
+        if event["type"] == "http.disconnect":
+            raise HTTPError("client disconnected")
+        body += event.get("body", b"")
+        if len(body) > MAX_BODY_BYTES:
+            raise HTTPError("request body too large", 413)
+        if not event.get("more_body"):
+            return body
+
+
+async def _read_json(receive) -> Dict[str, object]:
+    try:
+        payload = json.loads(await _read_body(receive) or b"{}")
+    except ValueError:
+        raise HTTPError("body must be JSON")
+    if not isinstance(payload, dict):
+        raise HTTPError("body must be a JSON object")
+    message = payload.get("message")
+    if not isinstance(message, str) or not message.strip():
+        raise HTTPError("'message' must be a non-empty string")
+    if len(message) > MAX_MESSAGE_CHARS:
+        raise HTTPError(f"'message' is longer than {MAX_MESSAGE_CHARS} characters", 413)
+    return payload
+
+
+def _history(payload: Dict[str, object]) -> List[Dict[str, str]]:
+    history = payload.get("history") or []
+    if not isinstance(history, list):
+        raise HTTPError("'history' must be a list")
+    turns = []
+    for turn in history:
+        if not isinstance(turn, dict) or turn.get("role") not in ("user", "assistant") \
+                or not isinstance(turn.get("content"), str):
+            raise HTTPError("'history' items must be {\"role\": \"user\"|\"assistant\", \"content\": str}")
+        turns.append({"role": turn["role"], "content": turn["content"]})
+    return turns
+
+
+async def _chat(payload: Dict[str, object]) -> Dict[str, object]:
+    persona = payload.get("persona") or DEFAULT_PERSONA
+    if not isinstance(persona, str) or persona not in PERSONAS:
+        raise HTTPError(f"unknown persona; choose one of {list(PERSONAS)}")
+    user_name: Optional[str] = payload.get("user_name") or None
+    if user_name is not None and not isinstance(user_name, str):
+        raise HTTPError("'user_name' must be a string")
+    session = payload.get("session_id") or None
+    if session is not None and not isinstance(session, str):
+        raise HTTPError("'session_id' must be a string")
+    reply = await respond_async(payload["message"], persona, _history(payload), user_name, DEFAULT_MODEL, session)
+    return {"branch": reply.branch, "reply": reply.text, "user_name": reply.user_name}
+
+
+async def _route(method: str, path: str, receive) -> Tuple[int, Union[str, Dict[str, object]]]:
+    routes = {"/v1/triage": "POST", "/v1/chat": "POST", "/healthz": "GET", "/metrics": "GET"}
+    path = path.rstrip("/") or "/"
+    if path not in routes:
+        raise HTTPError("not found", 404)
+    if method != routes[path]:
+        raise HTTPError("method not allowed", 405)
+    if path == "/healthz":
+        return 200, {"status": "ok", "llm_available": llm_available(), "circuit_open": llm_circuit_open()}
+    if path == "/metrics":
+        if not metrics.enabled():
+            raise HTTPError("metrics are disabled; set CAREPAL_METRICS=1", 404)
+        return 200, metrics.render()
+    payload = await _read_json(receive)
+    if path == "/v1/triage":
+        return 200, triage(payload["message"])
+    return 200, await _chat(payload)
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            event = await receive()
+            if event["type"] == "lifespan.startup":
+                warm_up()
+                await send({"type": "lifespan.startup.complete"})
+            elif event["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+    try:
+        status, payload = await _route(scope["method"], scope["path"], receive)
+    except HTTPError as exc:
+        status, payload = exc.status, {"error": str(exc)}
+    if isinstance(payload, str):
+        body, content_type = payload.encode("utf-8"), metrics.CONTENT_TYPE.encode("ascii")
+    else:
+        body, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), b"application/json; charset=utf-8"
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type), (b"content-length", str(len(body)).encode("ascii"))],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,185 @@
+"""Reclassify a log of past questions with the current keyword tables.
+
+Streams a JSONL or CSV file in chunks through a process pool and writes one
+JSON result per input record as soon as its chunk is done, so memory use
+stays flat however large the log is. Only a few chunks per worker are in
+flight at a time. Throughput goes to stderr.
+
+    python -m carepal.batch questions.jsonl -o triage.jsonl
+    python -m carepal.batch questions.csv --field question -o triage.jsonl --resume
+
+Every result carries the input record's ``index``. ``--start N`` skips the
+first N records; ``--resume`` continues after the records already in the
+output file.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from carepal.classify import get_disallowed_category, is_emergency, is_greeting, is_non_health_question, scan_keywords
+from carepal.intents import match_intent
+
+Record = Tuple[int, str]
+
+
+def classify_message(text: str) -> Dict[str, object]:
+    """Every classifier's verdict, and the branch the app would take (AI aside)."""
+    emergency = is_emergency(text)
+    greeting = is_greeting(text)
+    non_health = is_non_health_question(text)
+    category = get_disallowed_category(text)
+    intent = match_intent(scan_keywords(text).in_table("topic"))
+    topic = intent["key"] if intent is not None else None
+    if emergency:
+        branch = "emergency"
+    elif greeting:
+        branch = "greeting"
+    elif non_health:
+        branch = "non_health"
+    elif category is not None:
+        branch = "blocklist"
+    else:
+        branch = "local"
+    return {
+        "emergency": emergency,
+        "disallowed_category": category,
+        "non_health": non_health,
+        "greeting": greeting,
+        "topic": topic,
+        "branch": branch,
+    }
+
+
+def classify_chunk(chunk: List[Record]) -> List[str]:
+    lines = []
+    for index, text in chunk:
+        result = {"index": index, "message": text}
+        result.update(classify_message(text))
+        lines.append(json.dumps(result, ensure_ascii=False))
+    return lines
+
+
+def read_records(path: str, field: str, fmt: Optional[str] = None, start: int = 0) -> Iterator[Record]:
+    """Yield ``(index, message)`` from record ``start`` on; malformed or empty ones are skipped but keep their index."""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    with open(path, encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            for index, row in enumerate(csv.DictReader(f)):
+                if index >= start and row.get(field):
+                    yield index, row[field]
+            return
+        for index, line in enumerate(f):
+            if index < start:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            message = record.get(field) if isinstance(record, dict) else record
+            if isinstance(message, str) and message:
+                yield index, message
+
+
+def chunked(records: Iterator[Record], size: int) -> Iterator[List[Record]]:
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def completed_records(output: str) -> int:
+    """Index of the first record after the last result in ``output``.
+
+    A half-written last line, left behind when a run is killed mid-write, is
+    cut off so the resumed run can append cleanly.
+    """
+    if not os.path.exists(output):
+        return 0
+    last = None
+    complete_bytes = 0
+    with open(output, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            complete_bytes += len(line)
+            if line.strip():
+                last = line
+    if complete_bytes < os.path.getsize(output):
+        with open(output, "r+b") as f:
+            f.truncate(complete_bytes)
+    return json.loads(last)["index"] + 1 if last is not None else 0
+
+
+def run(records: Iterator[Record], out, workers: int, chunk_size: int, progress_every: float = 5.0) -> int:
+    """Classify ``records`` into ``out`` in input order; returns the number written."""
+    start = last_report = time.monotonic()
+    written = 0
+
+    def report(final: bool = False) -> None:
+        elapsed = max(time.monotonic() - start, 1e-9)
+        label = "done" if final else "progress"
+        print(f"{label}: {written} messages in {elapsed:.1f}s ({written / elapsed:,.0f} msg/s)", file=sys.stderr)
+
+    def write(lines: List[str]) -> None:
+        nonlocal written, last_report
+        out.write("\n".join(lines) + "\n")
+        out.flush()
+        written += len(lines)
+        if time.monotonic() - last_report >= progress_every:
+            last_report = time.monotonic()
+            report()
+
+    chunks = chunked(records, chunk_size)
+    if workers <= 1:
+        for chunk in chunks:
+            write(classify_chunk(chunk))
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            pending: deque = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(classify_chunk, chunk))
+                if len(pending) >= workers * 2:
+                    write(pending.popleft().result())
+            while pending:
+                write(pending.popleft().result())
+    report(final=True)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL (one object or string per line) or CSV file")
+    parser.add_argument("-o", "--output", default="-", help="JSONL results (default: stdout)")
+    parser.add_argument("--field", default="message", help="JSON key or CSV column holding the message")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="input format (default: from the extension)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--start", type=int, default=0, help="skip records before this index")
+    parser.add_argument("--resume", action="store_true", help="append to --output after its last result")
+    args = parser.parse_args()
+
+    start = args.start
+    if args.resume:
+        if args.output == "-":
+            parser.error("--resume needs --output")
+        start = max(start, completed_records(args.output))
+    records = read_records(args.input, args.field, args.format, start)
+    if start:
+        print(f"starting at record {start}", file=sys.stderr)
+    if args.output == "-":
+        run(records, sys.stdout, args.workers, args.chunk_size)
+    else:
+        with open(args.output, "a" if args.resume else "w", encoding="utf-8") as out:
+            run(records, out, args.workers, args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""Benchmarks for each stage of the reply pipeline and for the pipeline as a whole.
+
+Stage benchmarks time one function over a synthetic corpus of distinct
+messages, with the per-message caches cleared before every pass so each
+call does the real work. Pipeline benchmarks run ``respond_async`` end to
+end: once offline, and against the local stub LLM (``carepal.stub_server``)
+with response caching, the pre-router and the rate limiter off, so every
+message makes a full round trip. ``pipeline_stub_llm_routed`` repeats the stub run with the
+pre-router on.
+
+    python -m carepal.bench -o bench.json
+    python -m carepal.bench --baseline bench.json --threshold 0.25
+
+With ``--baseline``, any stage whose best time per call is more than
+``threshold`` slower than in the baseline file fails the run (exit status 1).
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+from carepal.classify import get_disallowed_category, is_emergency, is_non_health_question, scan_keywords
+from carepal.intents import STATIC_SECTIONS
+from carepal.measurements import find_measurements, parse_body
+from carepal.prompts import user_context
+from carepal.render import format_sections
+from carepal.router import route
+from carepal.responses import find_name, get_exercise_tips, local_response
+
+_CONDITIONS = [
+    "a small cut on my finger", "a cold and cough", "stress from exams", "a fever since last night",
+    "a sore throat", "a headache", "a migraine", "a stomach ache", "diarrhea", "loose stools",
+    "a burn from the stove", "a scald from hot water", "a nosebleed", "I feel faint", "signs of dehydration",
+    "food poisoning", "vomit and diarrhea", "dengue in our barangay", "heat exhaustion", "heat and I feel dizzy",
+    "anxiety at work", "panic attacks", "abdominal pain", "a wound on my knee", "throat pain",
+]
+_ASKS = [
+    "what should I do about {}", "how do I treat {}", "tips for {}", "I have {}", "my son has {}",
+    "first aid for {}", "home remedies for {}", "is it serious if I have {}", "{} what can I do",
+]
+_NUTRITION = [
+    "what should I eat for breakfast", "healthy snacks for studying", "meal plan for the week",
+    "how much water should I drink", "is rice bad for my diet", "healthy food for kids", "hydration tips",
+]
+_EXERCISE = [
+    "exercise for weight loss", "I want to lose weight", "how do I build muscle", "cardio routine for beginners",
+    "strength training at the gym", "running plan", "I'm new to exercise, how to start", "gain weight tips",
+]
+_MEASUREMENTS = [
+    "I'm {w}kg and {h}cm", "I weigh {w} kg and I'm {m} m tall", "{ft}'{inch}\" and {lb} lbs",
+    "I am {ft} ft {inch} in and {lb} pounds", "{w} kg, {h} cm, want to lose weight",
+]
+_GREETINGS = [
+    "hi", "hello", "hey there", "good morning", "hello my name is {name}", "hi, I'm {name}", "call me {name}",
+]
+_NAMES = ["Ana", "Ben", "Carlo", "Dana", "Eli", "Faye", "Gino", "Hana", "Ivy", "Jun"]
+_NON_HEALTH = [
+    "who is jose rizal", "what is the biggest planet", "solve this math equation", "weather tomorrow in manila",
+    "who won the election", "tell me about philippine history", "how does the solar system work",
+]
+_BLOCKED = [
+    "what dosage of amoxicillin should I take", "can you prescribe antibiotic", "how many mg of metformin",
+    "give me the exact diagnosis", "iv drip at home", "how to do stitches at home",
+]
+_EMERGENCIES = [
+    "chest pain and sweating", "my friend is not breathing", "he passed out and is unconscious",
+    "choking child", "severe bleeding from the leg", "signs of a stroke", "severe allergic reaction",
+]
+_VAGUE = ["I feel sick", "I'm tired all the time", "can you help me", "random question", "my test results"]
+
+# Rough mix of what the app receives.
+_MIX = [
+    ("condition", 40), ("nutrition", 8), ("exercise", 8), ("measurement", 8), ("greeting", 8),
+    ("non_health", 8), ("blocked", 6), ("emergency", 5), ("vague", 9),
+]
+
+
+def synthetic_corpus(size: int = 2000, seed: int = 7) -> List[str]:
+    """``size`` distinct, realistic-looking messages; the same for a given seed."""
+    rng = random.Random(seed)
+    kinds = [kind for kind, weight in _MIX for _ in range(weight)]
+    messages: List[str] = []
+    seen = set()
+    while len(messages) < size:
+        kind = rng.choice(kinds)
+        if kind == "condition":
+            text = rng.choice(_ASKS).format(rng.choice(_CONDITIONS))
+        elif kind == "measurement":
+            text = rng.choice(_MEASUREMENTS).format(
+                w=rng.randint(40, 120), h=rng.randint(145, 195), m=round(rng.uniform(1.45, 1.95), 2),
+                ft=rng.randint(4, 6), inch=rng.randint(0, 11), lb=rng.randint(90, 260))
+        elif kind == "greeting":
+            text = rng.choice(_GREETINGS).format(name=rng.choice(_NAMES))
+        else:
+            text = rng.choice({
+                "nutrition": _NUTRITION, "exercise": _EXERCISE, "non_health": _NON_HEALTH,
+                "blocked": _BLOCKED, "emergency": _EMERGENCIES, "vague": _VAGUE,
+            }[kind])
+        # Vary case and trailing context so messages stay distinct and caches stay cold.
+        if rng.random() < 0.3:
+            text = text.capitalize()
+        if text in seen:
+            text = f"{text} {rng.choice(['please', 'thanks', 'since yesterday', 'for 2 days', 'again'])} #{len(messages)}"
+        seen.add(text)
+        messages.append(text)
+    return messages
+
+
+def _clear_caches() -> None:
+    scan_keywords.cache_clear()
+    parse_body.cache_clear()
+    find_name.cache_clear()
+
+
+def _percentile(sorted_values: Sequence[float], p: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+def _summary(per_call: List[float], best_mean: float, n: int, repeat: int) -> Dict[str, float]:
+    per_call.sort()
+    return {
+        "calls": n,
+        "repeat": repeat,
+        "best_us": round(best_mean * 1e6, 3),
+        "p50_us": round(_percentile(per_call, 0.5) * 1e6, 3),
+        "p95_us": round(_percentile(per_call, 0.95) * 1e6, 3),
+        "per_second": round(1 / best_mean) if best_mean > 0 else 0,
+    }
+
+
+def time_stage(fn: Callable, inputs: Sequence, repeat: int = 5) -> Dict[str, float]:
+    """Time ``fn(item)`` over ``inputs``; ``best_us`` is the fastest pass's mean per call."""
+    best = float("inf")
+    per_call: List[float] = []
+    clock = time.perf_counter
+    for _ in range(repeat):
+        _clear_caches()
+        pass_start = clock()
+        for item in inputs:
+            start = clock()
+            fn(item)
+            per_call.append(clock() - start)
+        best = min(best, (clock() - pass_start) / len(inputs))
+    return _summary(per_call, best, len(inputs), repeat)
+
+
+def stage_benchmarks(corpus: List[str], repeat: int, only: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    sections = list(STATIC_SECTIONS.values())
+    context_inputs = [(name, [{"role": "user", "content": text}])
+                      for name, text in zip(itertools.cycle([None] + _NAMES), corpus)]
+    stages = {
+        "is_emergency": (is_emergency, corpus),
+        "get_disallowed_category": (get_disallowed_category, corpus),
+        "is_non_health_question": (is_non_health_question, corpus),
+        "local_response": (lambda text: local_response(text, "Clinic Nurse"), corpus),
+        "format_sections": (lambda s: format_sections(**s), sections),
+        "find_measurements": (find_measurements, corpus),
+        "find_name": (find_name, corpus),
+        "route": (route, corpus),
+        "get_exercise_tips": (get_exercise_tips, corpus),
+        "user_context": (lambda args: user_context(*args), context_inputs),
+    }
+    return {name: time_stage(fn, inputs, repeat) for name, (fn, inputs) in stages.items()
+            if only is None or re.search(only, name)}
+
+
+async def _time_pipeline(corpus: List[str], concurrency: int) -> Dict[str, float]:
+    from carepal.pipeline import respond_async
+
+    per_call: List[float] = []
+
+    async def one(text: str) -> None:
+        start = time.perf_counter()
+        await respond_async(text, "Clinic Nurse")
+        per_call.append(time.perf_counter() - start)
+
+    _clear_caches()
+    start = time.perf_counter()
+    for i in range(0, len(corpus), concurrency):
+        await asyncio.gather(*(one(text) for text in corpus[i:i + concurrency]))
+    elapsed = time.perf_counter() - start
+    summary = _summary(per_call, elapsed / len(corpus), len(corpus), 1)
+    summary["concurrency"] = concurrency
+    return summary
+
+
+PIPELINE_BENCHMARKS = ("pipeline_offline", "pipeline_stub_llm", "pipeline_stub_llm_concurrent", "pipeline_stub_llm_routed")
+
+
+def pipeline_benchmarks(corpus: List[str], concurrency: int) -> Dict[str, Dict[str, float]]:
+    from carepal.stub_server import start_stub_server
+
+    results = {}
+    saved = {name: os.environ.get(name) for name in
+             ("OPENAI_API_KEY", "OPENAI_BASE_URL", "CAREPAL_CACHE_BACKEND", "CAREPAL_SEMANTIC_CACHE", "CAREPAL_ROUTER",
+              "CAREPAL_RATE_LIMIT")}
+    os.environ.pop("OPENAI_API_KEY", None)
+    os.environ["CAREPAL_CACHE_BACKEND"] = "off"
+    os.environ["CAREPAL_SEMANTIC_CACHE"] = "0"
+    os.environ["CAREPAL_ROUTER"] = "0"
+    os.environ["CAREPAL_RATE_LIMIT"] = "0"
+    server, _ = start_stub_server()
+    try:
+        results["pipeline_offline"] = asyncio.run(_time_pipeline(corpus, 1))
+        os.environ["OPENAI_API_KEY"] = "sk-bench"
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+        results["pipeline_stub_llm"] = asyncio.run(_time_pipeline(corpus, 1))
+        if concurrency > 1:
+            results["pipeline_stub_llm_concurrent"] = asyncio.run(_time_pipeline(corpus, concurrency))
+        os.environ["CAREPAL_ROUTER"] = "1"
+        results["pipeline_stub_llm_routed"] = asyncio.run(_time_pipeline(corpus, 1))
+    finally:
+        server.shutdown()
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            threshold: float) -> List[str]:
+    """Stages more than ``threshold`` slower than the baseline, described."""
+    regressions = []
+    for name, stats in results.items():
+        before = baseline.get(name)
+        if not before or not before.get("best_us"):
+            continue
+        change = stats["best_us"] / before["best_us"] - 1
+        if change > threshold:
+            regressions.append(f"{name}: {before['best_us']:.1f}us -> {stats['best_us']:.1f}us (+{change:.0%})")
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    head = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".git", "HEAD")
+    try:
+        with open(head, encoding="utf-8") as f:
+            ref = f.read().strip()
+        if ref.startswith("ref: "):
+            with open(os.path.join(os.path.dirname(head), ref[5:]), encoding="utf-8") as f:
+                return f.read().strip()
+        return ref
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="earlier results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown per stage (0.25 = 25%%)")
+    parser.add_argument("--size", type=int, default=2000, help="messages in the synthetic corpus")
+    parser.add_argument("--repeat", type=int, default=5, help="passes per stage benchmark")
+    parser.add_argument("--concurrency", type=int, default=16, help="parallel requests for the concurrent run")
+    parser.add_argument("--only", help="regex; run only the matching benchmarks")
+    parser.add_argument("--no-pipeline", action="store_true", help="skip the end-to-end pipeline runs")
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.size)
+    results = stage_benchmarks(corpus, args.repeat, args.only)
+    if not args.no_pipeline and (args.only is None or any(re.search(args.only, name) for name in PIPELINE_BENCHMARKS)):
+        pipeline = pipeline_benchmarks(corpus, args.concurrency)
+        results.update((name, stats) for name, stats in pipeline.items() if args.only is None or re.search(args.only, name))
+
+    print(f"{'benchmark':34} {'best us':>10} {'p50 us':>10} {'p95 us':>10} {'per s':>10}")
+    for name, stats in results.items():
+        print(f"{name:34} {stats['best_us']:10.1f} {stats['p50_us']:10.1f} {stats['p95_us']:10.1f} "
+              f"{stats['per_second']:10,}")
+
+    if args.output:
+        report = {
+            "meta": {
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "commit": _git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "corpus_size": args.size,
+                "repeat": args.repeat,
+            },
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f)["results"], args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Circuit breaker for the upstream LLM.
+
+While closed, every call goes through and its outcome is recorded. When too
+many recent calls fail or are slow, the breaker opens and callers skip the
+LLM for a cooldown period. After that a few half-open trial calls decide
+whether to close again or reopen.
+
+Configured through environment variables:
+
+- ``CAREPAL_BREAKER_WINDOW``: seconds of history considered
+- ``CAREPAL_BREAKER_MIN_CALLS``: calls needed in the window before it can open
+- ``CAREPAL_BREAKER_ERROR_RATE``: failure ratio that opens it
+- ``CAREPAL_BREAKER_SLOW_SECONDS`` / ``CAREPAL_BREAKER_SLOW_RATE``: what counts as slow, and the slow ratio that opens it
+- ``CAREPAL_BREAKER_COOLDOWN``: seconds to stay open
+- ``CAREPAL_BREAKER_HALF_OPEN_CALLS``: trial calls allowed while half-open
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, NamedTuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class BreakerConfig(NamedTuple):
+    window: float = 60.0
+    min_calls: int = 5
+    error_rate: float = 0.5
+    slow_seconds: float = 10.0
+    slow_rate: float = 0.5
+    cooldown: float = 30.0
+    half_open_calls: int = 1
+
+    @classmethod
+    def from_env(cls) -> "BreakerConfig":
+        return cls(
+            window=float(os.getenv("CAREPAL_BREAKER_WINDOW", "60")),
+            min_calls=int(os.getenv("CAREPAL_BREAKER_MIN_CALLS", "5")),
+            error_rate=float(os.getenv("CAREPAL_BREAKER_ERROR_RATE", "0.5")),
+            slow_seconds=float(os.getenv("CAREPAL_BREAKER_SLOW_SECONDS", "10")),
+            slow_rate=float(os.getenv("CAREPAL_BREAKER_SLOW_RATE", "0.5")),
+            cooldown=float(os.getenv("CAREPAL_BREAKER_COOLDOWN", "30")),
+            half_open_calls=int(os.getenv("CAREPAL_BREAKER_HALF_OPEN_CALLS", "1")),
+        )
+
+
+class CircuitBreaker:
+    def __init__(self, config: BreakerConfig = BreakerConfig()):
+        self.config = config
+        self._lock = threading.Lock()
+        self._outcomes: deque = deque()  # (timestamp, ok, slow)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        self.times_opened = 0
+
+    def _refresh(self, now: float) -> None:
+        if self._state == OPEN and now - self._opened_at >= self.config.cooldown:
+            self._state = HALF_OPEN
+            self._trials = 0
+        while self._outcomes and now - self._outcomes[0][0] > self.config.window:
+            self._outcomes.popleft()
+
+    def _open(self, now: float) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._outcomes.clear()
+        self.times_opened += 1
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh(time.monotonic())
+            return self._state
+
+    def retry_in(self) -> float:
+        """Seconds until an open breaker starts letting trial calls through."""
+        with self._lock:
+            now = time.monotonic()
+            self._refresh(now)
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self.config.cooldown - (now - self._opened_at))
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now. Takes a trial slot when half-open."""
+        with self._lock:
+            self._refresh(time.monotonic())
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._trials < self.config.half_open_calls:
+                self._trials += 1
+                return True
+            return False
+
+    def release(self) -> None:
+        """Give back the trial slot of a call that ended without an outcome to judge."""
+        with self._lock:
+            if self._state == HALF_OPEN and self._trials > 0:
+                self._trials -= 1
+
+    def record(self, ok: bool, seconds: float) -> None:
+        slow = seconds >= self.config.slow_seconds
+        with self._lock:
+            now = time.monotonic()
+            self._refresh(now)
+            if self._state == HALF_OPEN:
+                if ok and not slow:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open(now)
+                return
+            if self._state == OPEN:
+                return
+            self._outcomes.append((now, ok, slow))
+            total = len(self._outcomes)
+            if total < self.config.min_calls:
+                return
+            failures = sum(1 for _, succeeded, _ in self._outcomes if not succeeded)
+            slow_calls = sum(1 for _, _, was_slow in self._outcomes if was_slow)
+            if failures / total >= self.config.error_rate or slow_calls / total >= self.config.slow_rate:
+                self._open(now)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            now = time.monotonic()
+            self._refresh(now)
+            total = len(self._outcomes)
+            return {
+                "state": self._state,
+                "recent_calls": total,
+                "recent_errors": sum(1 for _, ok, _ in self._outcomes if not ok),
+                "times_opened": self.times_opened,
+            }
@@ -0,0 +1,187 @@
+"""Keyword tables and the single-pass matcher every classifier reads from.
+
+Streamlit re-executes ``app.py`` on every rerun, so the matcher lives here to be
+built once per process instead of once per interaction.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, NamedTuple, Optional
+
+from carepal.intents import INTENT_TRIGGERS
+
+EMERGENCY_KEYWORDS = [
+    "chest pain", "severe bleeding", "not breathing", "unconscious", "stroke", "heart attack",
+    "can't breathe", "breathing trouble", "passed out", "fainted", "bleeding heavily",
+    "blood everywhere", "heart attack", "cardiac arrest", "choking", "severe allergic reaction",
+    "anaphylaxis", "severe head injury", "spinal injury", "severe burn", "overdose"
+]
+
+BLOCKLIST_CATEGORIES = {
+    "Medication specifics / prescribing": [
+        "dosage", "dose", "mg", "milligram", "prescribe", "prescription",
+        "antibiotic", "amoxicillin", "metformin", "insulin", "opioid",
+    ],
+    "High-risk domains": [
+        "self-harm", "suicide", "kill myself", "overdose",
+    ],
+    "Diagnostic certainty": [
+        "exact diagnosis", "what disease is this exactly",
+    ],
+    "Experimental/dangerous": [
+        "inject", "iv drip at home", "home surgery", "stitches at home",
+    ],
+}
+
+NON_HEALTH_KEYWORDS = [
+    "jose rizal", "rizal", "history", "philippine history", "hero",
+    "biggest planet", "planet", "solar system", "space", "astronomy",
+    "math", "mathematics", "equation", "solve", "calculate",
+    "weather", "climate", "temperature", "rain", "storm",
+    "politics", "government", "election", "president",
+    "sports", "basketball", "football", "game", "team",
+    "technology", "computer", "programming", "software",
+    "cooking", "recipe", "food preparation", "kitchen",
+    "travel", "vacation", "tourism", "place", "country",
+    "education", "school", "study", "exam", "test",
+    "entertainment", "movie", "music", "book", "story"
+]
+
+GREETING_WORDS = ["hello", "hey", "good morning", "good afternoon", "good evening", "greetings"]
+
+NUTRITION_KEYWORDS = [
+    "nutrition", "diet", "food", "eating", "eat", "meal", "breakfast", "lunch", "dinner",
+    "snack", "hydrate", "water", "healthy food", "meal plan",
+]
+
+EXERCISE_KEYWORDS = [
+    "exercise", "workout", "fitness", "gym", "weight loss", "lose weight", "gain weight",
+    "muscle", "cardio", "strength training",
+]
+
+# Details that make a canned answer a poor fit: who is affected, how long it has
+# lasted, or a why/compare question. The pre-router sends these to the AI.
+CAVEAT_KEYWORDS = [
+    "pregnan", "breastfeeding", "my baby", "my child", "my son", "my daughter", "my kid", "toddler",
+    "infant", "elderly", "my lola", "my lolo", "diabetic", "diabetes", "asthma", "heart disease",
+    "high blood pressure", "hypertension", "medication", "maintenance meds", "for weeks", "for a week",
+    "for months", "keeps coming back", "won't stop", "not getting better", "worse",
+    "what causes", "why do", "why does", "why am", "why is", "difference between", " vs ", " or ",
+]
+
+
+class KeywordHits(NamedTuple):
+    """Every keyword found in one message, overall and per table."""
+    keywords: FrozenSet[str]
+    tables: Dict[str, FrozenSet[str]]
+
+    def in_table(self, table: str) -> FrozenSet[str]:
+        return self.tables.get(table, frozenset())
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    # Factor shared prefixes so each text position only branches on one
+    # character per level, however many keywords there are.
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        if "" in node:
+            # Greedy optional: the longest keyword at a position wins.
+            return "(?:" + body + ")?"
+        return body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """Finds every keyword from every table in one scan of the text.
+
+    Matches are plain substrings, including overlapping ones, exactly like the
+    ``keyword in text`` checks they replace.
+    """
+
+    def __init__(self, tables: Dict[str, Iterable[str]]):
+        self._tables_for: Dict[str, FrozenSet[str]] = {}
+        for table, keywords in tables.items():
+            for keyword in keywords:
+                keyword = keyword.lower()
+                self._tables_for[keyword] = self._tables_for.get(keyword, frozenset()) | {table}
+        # The scan reports the longest keyword starting at each position; any
+        # shorter keyword starting there is one of its prefixes.
+        self._prefixes = {
+            keyword: tuple(keyword[:i] for i in range(1, len(keyword)) if keyword[:i] in self._tables_for)
+            for keyword in self._tables_for
+        }
+        if self._tables_for:
+            self._pattern = re.compile("(?=(" + _trie_pattern(self._tables_for) + "))")
+        else:
+            self._pattern = None
+
+    def scan(self, text: str) -> KeywordHits:
+        found = set()
+        if self._pattern is not None:
+            for match in self._pattern.finditer(text.lower()):
+                longest = match.group(1)
+                found.add(longest)
+                found.update(self._prefixes[longest])
+        tables: Dict[str, set] = {}
+        for keyword in found:
+            for table in self._tables_for[keyword]:
+                tables.setdefault(table, set()).add(keyword)
+        return KeywordHits(frozenset(found), {name: frozenset(kws) for name, kws in tables.items()})
+
+
+def _blocklist_table(category: str) -> str:
+    return f"blocklist:{category}"
+
+
+MATCHER = KeywordMatcher({
+    "emergency": EMERGENCY_KEYWORDS,
+    **{_blocklist_table(category): keywords for category, keywords in BLOCKLIST_CATEGORIES.items()},
+    "non_health": NON_HEALTH_KEYWORDS,
+    "greeting": GREETING_WORDS,
+    "topic": INTENT_TRIGGERS,
+    "nutrition": NUTRITION_KEYWORDS,
+    "exercise": EXERCISE_KEYWORDS,
+    "caveat": CAVEAT_KEYWORDS,
+})
+
+
+@lru_cache(maxsize=1024)
+def scan_keywords(text: str) -> KeywordHits:
+    """Scan once per distinct message; every classifier below reuses the result."""
+    return MATCHER.scan(text)
+
+
+def is_emergency(text: str) -> bool:
+    return bool(scan_keywords(text).in_table("emergency"))
+
+
+def get_disallowed_category(text: str) -> Optional[str]:
+    hits = scan_keywords(text)
+    for category in BLOCKLIST_CATEGORIES:
+        if hits.in_table(_blocklist_table(category)):
+            return category
+    return None
+
+
+def is_disallowed(text: str) -> bool:
+    return get_disallowed_category(text) is not None
+
+
+def is_non_health_question(text: str) -> bool:
+    """Check if the question is not health-related"""
+    return bool(scan_keywords(text).in_table("non_health"))
+
+
+def is_greeting(text: str) -> bool:
+    return bool(scan_keywords(text).in_table("greeting")) or text.lower().strip() == "hi"
+
@@ -0,0 +1,119 @@
+"""Token-budgeted conversation window for LLM requests.
+
+The system prompt is always sent, followed by any per-user context. Recent
+turns are added newest-first until the token budget is spent. Older turns
+can be folded into one short memory message so the model keeps the gist
+without the request growing with the session.
+
+Configured through environment variables:
+
+- ``CAREPAL_HISTORY_TOKEN_BUDGET``: tokens allowed for the turns after the system prompt
+- ``CAREPAL_HISTORY_SUMMARY``: ``1`` (default) to summarize dropped turns, ``0`` to drop them
+- ``CAREPAL_HISTORY_SUMMARY_BUDGET``: tokens allowed for that summary
+"""
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+# Role markers and separators the API adds around every message.
+MESSAGE_OVERHEAD = 4
+
+_WORDS = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """The tokenizer, loaded on first use since it reads a large BPE file."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """Token count for one message body, computed once per distinct text."""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # Without tiktoken (or its BPE file), count a token per three letters of each word and one
+    # per punctuation mark: high for English, but not under for Tagalog terms like "malunggay".
+    return sum(-(-len(word) // 3) for word in _WORDS.findall(text))
+
+
+def message_tokens(message: Dict[str, str]) -> int:
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+
+def summarize_turns(turns: List[Dict[str, str]], budget: int) -> str:
+    """Compact memory of earlier questions, newest kept first when over budget."""
+    topics = []
+    used = 0
+    for m in reversed(turns):
+        if m["role"] != "user":
+            continue
+        first_sentence = _SENTENCE_END.split(m["content"].strip(), 1)[0][:160]
+        cost = count_tokens(first_sentence) + 2
+        if used + cost > budget:
+            break
+        topics.append(first_sentence)
+        used += cost
+    if not topics:
+        return ""
+    return "Earlier in this conversation the user asked about: " + "; ".join(reversed(topics))
+
+
+def window_messages(system_prompt: str, history: List[Dict[str, str]], budget: int,
+                    summarize: bool = True, summary_budget: int = 200,
+                    context: Optional[str] = None) -> List[Dict[str, str]]:
+    """Build the request messages: system prompt, user context, optional memory, then recent turns.
+
+    The system prompt is sent unchanged so every request shares it as a
+    prefix the provider can cache; per-user ``context`` follows it in its own
+    message. The newest message is always kept, even if it alone exceeds the
+    budget.
+    """
+    turns = [m for m in history if m["role"] in ("user", "assistant")]
+    kept: List[Dict[str, str]] = []
+    remaining = budget - (summary_budget + MESSAGE_OVERHEAD if summarize else 0)
+    if context:
+        remaining -= count_tokens(context) + MESSAGE_OVERHEAD
+    start = len(turns)
+    for i in range(len(turns) - 1, -1, -1):
+        cost = message_tokens(turns[i])
+        if kept and cost > remaining:
+            break
+        kept.append(turns[i])
+        remaining -= cost
+        start = i
+    kept.reverse()
+
+    messages = [{"role": "system", "content": system_prompt}]
+    if context:
+        messages.append({"role": "system", "content": context})
+    if summarize and start > 0:
+        memory = summarize_turns(turns[:start], summary_budget)
+        if memory:
+            messages.append({"role": "system", "content": memory})
+    messages.extend(kept)
+    return messages
+
+
+def history_budget() -> int:
+    return int(os.getenv("CAREPAL_HISTORY_TOKEN_BUDGET", "3000"))
+
+
+def build_chat_messages(system_prompt: str, history: List[Dict[str, str]],
+                        context: Optional[str] = None) -> List[Dict[str, str]]:
+    """``window_messages`` with the budget taken from the environment."""
+    return window_messages(
+        system_prompt,
+        history,
+        budget=history_budget(),
+        summarize=os.getenv("CAREPAL_HISTORY_SUMMARY", "1") == "1",
+        summary_budget=int(os.getenv("CAREPAL_HISTORY_SUMMARY_BUDGET", "200")),
+        context=context,
+    )
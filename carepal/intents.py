@@ -0,0 +1,852 @@
+"""Declarative content for the rule-based fallback.
+
+Each condition intent lists its trigger keywords, a priority (lower wins when
+several topics match) and the ``format_sections`` arguments for its answer. A
+trigger is either a keyword or a tuple of keywords that must all appear.
+Exercise plans, the nutrition guide and the general answer live alongside
+them in ``STATIC_SECTIONS`` so every canned reply is rendered only once.
+
+The fallback matches triggers as plain substrings, which is fine for a best
+effort offline answer. The pre-router skips the AI on a match, so it reads
+``ROUTE_TRIGGERS`` instead: whole words and phrases only, spelled out per
+inflection, and without ambiguous words such as a bare "cold" or "a cold"
+("a cold shower"). ``ROUTE_RED_FLAGS`` lists, per intent, the warning signs
+from its "watch for" and "when to see" sections; a message that describes
+one needs more than the canned answer.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+CONDITION_INTENTS = [
+    {
+        "key": "cut",
+        "priority": 10,
+        "triggers": ["cut", "wound"],
+        "sections": dict(
+            title="Small cut or minor wound",
+            what_it_is="A small break in the skin that may bleed a little and usually heals on its own with basic care.",
+            do_now=[
+                "Wash your hands.",
+                "Gently clean the cut with clean water.",
+                "Apply gentle pressure with a clean cloth to stop bleeding.",
+                "Cover with a clean bandage.",
+            ],
+            watch_for=[
+                "Redness spreading, pus, or increasing pain/swelling (possible infection).",
+                "Bleeding that doesn’t stop after 10 minutes of pressure.",
+            ],
+            when_to_see=[
+                "The cut is deep, very dirty, or edges are far apart.",
+                "You haven’t had a tetanus shot in the last 5–10 years.",
+            ],
+        ),
+    },
+    {
+        "key": "cold",
+        "priority": 20,
+        "triggers": ["cold", "cough"],
+        "sections": dict(
+            title="Common cold or cough",
+            what_it_is="A mild viral illness causing stuffy/runny nose, sore throat, or cough.",
+            do_now=[
+                "Drink plenty of water and rest well.",
+                "Warm soups, steam, or a humidifier may help.",
+            ],
+            watch_for=[
+                "High fever, chest pain, trouble breathing, or confusion.",
+                "Symptoms lasting more than a week or getting worse.",
+            ],
+            when_to_see=[
+                "Breathing difficulties, severe chest pain, or persistent high fever.",
+            ],
+            extra_notes=[
+                "Over-the-counter options may help; follow the product label exactly.",
+                "Do not mix products with the same active ingredient.",
+                "If pregnant/breastfeeding, for children, or with chronic conditions, ask a clinician before taking any medication.",
+            ],
+        ),
+    },
+    {
+        "key": "stress",
+        "priority": 30,
+        "triggers": ["stress", "anxiety", "panic attacks"],
+        "sections": dict(
+            title="Stress or anxiety",
+            what_it_is="A common response to pressure; short-term strategies can help you feel calmer.",
+            do_now=[
+                "Take slow, deep breaths for 1–2 minutes.",
+                "Stretch or do light exercise; take a short walk.",
+                "Write down worries and one small action you can take.",
+                "Talk to a supportive friend or family member.",
+            ],
+            watch_for=[
+                "Panic attacks, unrelenting anxiety, or thoughts of self-harm.",
+            ],
+            when_to_see=[
+                "Symptoms that persist or interfere with daily life.",
+            ],
+        ),
+    },
+    {
+        "key": "fever",
+        "priority": 40,
+        "triggers": ["fever", "high temperature"],
+        "sections": dict(
+            title="Fever (non-emergency care)",
+            what_it_is="A temporary rise in body temperature, often due to infection.",
+            do_now=[
+                "Drink plenty of fluids (water, oral rehydration, broths).",
+                "Rest and wear light clothing; keep the room comfortably cool.",
+                "Sponge with lukewarm water if uncomfortable (avoid ice-cold baths).",
+            ],
+            watch_for=[
+                "Very high fever, stiff neck, confusion, severe headache, breathing trouble, chest pain, persistent vomiting.",
+            ],
+            when_to_see=[
+                "Fever lasting more than 2–3 days or if you feel very unwell.",
+            ],
+            extra_notes=[
+                "You may consider over-the-counter fever reducers; follow the product label exactly.",
+                "Do not mix products with the same active ingredient.",
+                "If pregnant/breastfeeding, for children, or with chronic conditions, check with a clinician first.",
+            ],
+        ),
+    },
+    {
+        "key": "sore_throat",
+        "priority": 50,
+        "triggers": ["sore throat", "throat pain"],
+        "sections": dict(
+            title="Sore throat",
+            what_it_is="Irritation or pain in the throat, often from a viral infection.",
+            do_now=[
+                "Warm saltwater gargles (1/2 tsp salt in a cup of warm water).",
+                "Warm fluids (soups, tea with honey) and good hydration.",
+                "Use a humidifier or take steamy showers.",
+                "Throat lozenges or sprays can help; follow the label directions.",
+            ],
+            watch_for=[
+                "Severe pain, drooling, trouble breathing, rash, or high fever.",
+            ],
+            when_to_see=[
+                "Symptoms lasting more than a few days or worsening.",
+            ],
+            extra_notes=[
+                "Do not mix products with the same active ingredient.",
+                "If pregnant/breastfeeding, for children, or with chronic conditions, ask a clinician before taking any medication.",
+            ],
+        ),
+    },
+    {
+        "key": "headache",
+        "priority": 60,
+        "triggers": ["headache", "migraine", "head pain"],
+        "sections": dict(
+            title="Common headache",
+            what_it_is="Head pain often related to tension, dehydration, or screen strain.",
+            do_now=[
+                "Hydrate and have regular, balanced meals.",
+                "Rest in a quiet, dim room; take screen breaks and mind your posture.",
+                "Manage stress with brief breathing or stretching breaks.",
+            ],
+            watch_for=[
+                "Worst-ever sudden headache, head injury, fever with stiff neck, confusion, weakness/numbness, vision changes.",
+            ],
+            when_to_see=[
+                "Headaches that get worse, keep returning, or don’t respond to simple care.",
+            ],
+            extra_notes=[
+                "Over-the-counter pain relievers may help; follow the product label exactly.",
+                "Do not mix products with the same active ingredient.",
+                "If pregnant/breastfeeding, for children, or with chronic conditions, check with a clinician first.",
+            ],
+        ),
+    },
+    {
+        "key": "stomach_ache",
+        "priority": 70,
+        "triggers": ["stomach ache", "stomachache", "abdominal pain"],
+        "sections": dict(
+            title="Mild stomach ache",
+            what_it_is="Abdominal discomfort that often improves with rest and light diet.",
+            do_now=[
+                "Sip clear fluids (water or oral rehydration).",
+                "Try small, bland meals (crackers, toast, rice, bananas).",
+                "Rest and avoid strenuous activity.",
+            ],
+            watch_for=[
+                "Severe pain, persistent vomiting, blood in stool/vomit, black stool, fever with pain, or worsening pain.",
+            ],
+            when_to_see=[
+                "Pain that lasts more than a day or is severe.",
+            ],
+        ),
+    },
+    {
+        "key": "diarrhea",
+        "priority": 80,
+        "triggers": ["diarrhea", "loose stools"],
+        "sections": dict(
+            title="Diarrhea",
+            what_it_is="Frequent, loose stools that can cause dehydration.",
+            do_now=[
+                "Hydrate with water or oral rehydration solution (small, frequent sips).",
+                "Eat bland foods (bananas, rice, applesauce, toast) as tolerated.",
+                "Wash hands and clean surfaces to prevent spread.",
+            ],
+            watch_for=[
+                "Blood or black stool, high fever, signs of dehydration (very dry mouth, dizziness).",
+            ],
+            when_to_see=[
+                "Symptoms lasting more than 2–3 days or any red-flag symptoms.",
+            ],
+        ),
+    },
+    {
+        "key": "burn",
+        "priority": 90,
+        "triggers": ["burn", "scald"],
+        "sections": dict(
+            title="Minor burn or scald (first-degree)",
+            what_it_is="Red, painful skin without blisters.",
+            do_now=[
+                "Cool the area under cool running water for 10–20 minutes (not ice).",
+                "Remove tight items (rings/watches) near the area before swelling.",
+                "Cover loosely with a clean, non‑stick dressing.",
+            ],
+            watch_for=[
+                "Large area, worsening pain, or signs of infection.",
+            ],
+            when_to_see=[
+                "Face, hands, genitals, or a large area; or if blisters form.",
+            ],
+        ),
+    },
+    {
+        "key": "nosebleed",
+        "priority": 100,
+        "triggers": ["nosebleed", "nose bleed"],
+        "sections": dict(
+            title="Nosebleed",
+            what_it_is="Bleeding from inside the nose, often from dryness or minor injury.",
+            do_now=[
+                "Sit upright, tilt head slightly forward.",
+                "Pinch the soft part of the nose for 10–15 minutes without releasing.",
+                "Spit out blood; avoid swallowing.",
+            ],
+            watch_for=[
+                "Bleeding that doesn’t stop after 20 minutes, dizziness, or if on blood thinners.",
+            ],
+            when_to_see=[
+                "Frequent nosebleeds or after a significant injury.",
+            ],
+        ),
+    },
+    {
+        "key": "fainting",
+        "priority": 110,
+        "triggers": ["faint", "passed out", "syncope"],
+        "sections": dict(
+            title="Fainting (syncope)",
+            what_it_is="Brief loss of consciousness often from low blood pressure or dehydration.",
+            do_now=[
+                "Lay the person on their back and raise legs if safe.",
+                "Loosen tight clothing and ensure fresh air.",
+                "When awake, offer sips of water if not nauseated.",
+            ],
+            watch_for=[
+                "Head injury, chest pain, shortness of breath, confusion, or repeated fainting.",
+            ],
+            when_to_see=[
+                "Any head injury or if episodes repeat or don’t recover quickly.",
+            ],
+        ),
+    },
+    {
+        "key": "dehydration",
+        "priority": 120,
+        "triggers": ["dehydration"],
+        "sections": dict(
+            title="Dehydration",
+            what_it_is="Not enough fluids in the body; can cause dizziness or fatigue.",
+            do_now=[
+                "Sip oral rehydration solution or water regularly.",
+                "Rest in a cool area and avoid heat.",
+            ],
+            watch_for=[
+                "Very dry mouth, minimal urine, dizziness/fainting, confusion.",
+            ],
+            when_to_see=[
+                "Severe symptoms or if unable to keep fluids down.",
+            ],
+        ),
+    },
+    {
+        "key": "food_poisoning",
+        "priority": 130,
+        "triggers": ["food poisoning", ("vomit", "diarrhea")],
+        "sections": dict(
+            title="Suspected food poisoning",
+            what_it_is="Gastro symptoms after eating contaminated food.",
+            do_now=[
+                "Hydrate with water or oral rehydration solution.",
+                "Rest and reintroduce bland foods slowly.",
+            ],
+            watch_for=[
+                "Blood in stool/vomit, black stool, high fever, signs of dehydration.",
+            ],
+            when_to_see=[
+                "Symptoms lasting more than 1–2 days or any red‑flag symptoms.",
+            ],
+        ),
+    },
+    {
+        "key": "dengue",
+        "priority": 140,
+        "triggers": ["dengue"],
+        "sections": dict(
+            title="Dengue prevention (Philippines)",
+            what_it_is="Viral illness spread by Aedes mosquitoes.",
+            do_now=[
+                "Eliminate standing water (flower pots, containers).",
+                "Use mosquito repellent and wear long sleeves/pants.",
+                "Use screens or nets; keep surroundings clean.",
+            ],
+            watch_for=[
+                "High fever, severe headache, eye pain, joint/muscle pain, bleeding gums or nose.",
+            ],
+            when_to_see=[
+                "Any warning signs or persistent high fever; seek medical care.",
+            ],
+        ),
+    },
+    {
+        "key": "heat_exhaustion",
+        "priority": 150,
+        "triggers": ["heat exhaustion", ("heat", "dizzy")],
+        "sections": dict(
+            title="Heat exhaustion",
+            what_it_is="Overheating with heavy sweating and weakness.",
+            do_now=[
+                "Move to a cool place; loosen clothing.",
+                "Sip water or oral rehydration solution; cool the skin with wet cloths or a fan.",
+            ],
+            watch_for=[
+                "Confusion, fainting, very high temperature, or no sweating (possible heat stroke).",
+            ],
+            when_to_see=[
+                "Symptoms not improving within 30 minutes or any red‑flag signs.",
+            ],
+        ),
+    },
+]
+
+
+GENERAL_WELLNESS_SECTIONS = dict(
+    title="General wellness",
+    what_it_is="I couldn’t fully understand your question, so here are safe general tips that often help with mild concerns.",
+    do_now=["Drink water.", "Get enough rest.", "Eat balanced meals."],
+    watch_for=["Symptoms that persist, worsen, or include red‑flag signs (severe pain, trouble breathing, confusion)."],
+    when_to_see=["Any serious or persistent symptoms."],
+)
+
+EXERCISE_PLANS = {
+    "weight_loss_plan": dict(
+        title="Weight Loss Exercise Plan",
+        what_it_is="A safe, gradual approach to losing weight through exercise and healthy habits.",
+        do_now=[
+            "Start with 30 minutes of moderate cardio 3-4 times per week (walking, cycling, swimming)",
+            "Add 2-3 strength training sessions per week to build muscle and boost metabolism",
+            "Begin with bodyweight exercises: squats, push-ups, planks, lunges",
+            "Include flexibility exercises: yoga or stretching for 10-15 minutes daily"
+        ],
+        watch_for=[
+            "Joint pain or excessive fatigue",
+            "Dizziness or feeling faint during exercise",
+            "Chest pain or difficulty breathing"
+        ],
+        when_to_see=[
+            "Any concerning symptoms during exercise",
+            "If you have heart conditions, diabetes, or other health issues"
+        ],
+        extra_notes=[
+            "Start slowly and gradually increase intensity",
+            "Aim for 150 minutes of moderate exercise per week",
+            "Combine with healthy eating for best results",
+            "Track your progress but don't obsess over the scale",
+            "💡 **For personalized advice, tell me your height and weight like:** 'I'm 70kg and 170cm' or 'I'm 5'8\" and 150lbs'"
+        ],
+    ),
+    "weight_management": dict(
+        title="Healthy Weight Management",
+        what_it_is="Maintaining a healthy weight through balanced exercise and nutrition.",
+        do_now=[
+            "Mix cardio and strength training for overall fitness",
+            "Try 30-45 minutes of moderate exercise most days",
+            "Include activities you enjoy: dancing, sports, hiking",
+            "Focus on building strength and endurance"
+        ],
+        watch_for=[
+            "Signs of overtraining: excessive fatigue, mood changes",
+            "Joint pain or injury"
+        ],
+        when_to_see=[
+            "Persistent pain or injury",
+            "If you have concerns about your weight or health"
+        ],
+        extra_notes=[
+            "Maintain a balanced approach to exercise and nutrition",
+            "Listen to your body and rest when needed"
+        ],
+    ),
+    "muscle_building": dict(
+        title="Muscle Building Exercise Plan",
+        what_it_is="A structured approach to building muscle mass and strength safely.",
+        do_now=[
+            "Focus on compound exercises: squats, deadlifts, bench press, rows",
+            "Start with 3-4 strength training sessions per week",
+            "Use progressive overload: gradually increase weight or reps",
+            "Include 1-2 days of light cardio for heart health"
+        ],
+        watch_for=[
+            "Overtraining signs: excessive fatigue, poor sleep, mood changes",
+            "Joint pain or injury from improper form"
+        ],
+        when_to_see=[
+            "Persistent pain or injury",
+            "If you have heart conditions or other health concerns"
+        ],
+        extra_notes=[
+            "Proper form is more important than heavy weights",
+            "Rest and recovery are crucial for muscle growth",
+            "Combine with adequate protein intake",
+            "Consider working with a trainer for proper technique",
+            "💡 **For personalized advice, tell me your height and weight like:** 'I'm 70kg and 170cm' or 'I'm 5'8\" and 150lbs'"
+        ],
+    ),
+    "cardio": dict(
+        title="Cardiovascular Exercise",
+        what_it_is="Exercise that strengthens your heart and improves endurance.",
+        do_now=[
+            "Start with 20-30 minutes of moderate cardio 3-4 times per week",
+            "Choose activities you enjoy: walking, running, cycling, swimming, dancing",
+            "Warm up for 5-10 minutes before intense exercise",
+            "Cool down and stretch after your workout"
+        ],
+        watch_for=[
+            "Chest pain, dizziness, or difficulty breathing",
+            "Excessive fatigue that doesn't improve with rest"
+        ],
+        when_to_see=[
+            "Any concerning symptoms during exercise",
+            "If you have heart conditions or breathing problems"
+        ],
+        extra_notes=[
+            "Build up gradually - don't overdo it in the beginning",
+            "Stay hydrated before, during, and after exercise",
+            "Listen to your body and rest when needed"
+        ],
+    ),
+    "strength_training": dict(
+        title="Strength Training Basics",
+        what_it_is="Exercise that builds muscle strength and bone density.",
+        do_now=[
+            "Start with bodyweight exercises: squats, push-ups, planks, lunges",
+            "Focus on proper form before adding weight",
+            "Work all major muscle groups: legs, chest, back, arms, core",
+            "Rest 1-2 days between strength training sessions"
+        ],
+        watch_for=[
+            "Sharp pain during exercise",
+            "Excessive muscle soreness that lasts more than 3 days"
+        ],
+        when_to_see=[
+            "Persistent pain or injury",
+            "If you have joint problems or other health conditions"
+        ],
+        extra_notes=[
+            "Proper form prevents injury and maximizes results",
+            "Start light and gradually increase weight",
+            "Include both pushing and pulling movements",
+            "Don't skip leg day - work all muscle groups"
+        ],
+    ),
+    "exercise_beginner": dict(
+        title="Getting Started with Exercise",
+        what_it_is="A beginner-friendly approach to starting a regular exercise routine.",
+        do_now=[
+            "Start with 10-15 minutes of light activity daily",
+            "Try walking, gentle stretching, or basic bodyweight exercises",
+            "Set realistic goals: aim for 3 days per week initially",
+            "Choose activities you enjoy to build the habit"
+        ],
+        watch_for=[
+            "Excessive fatigue or muscle soreness",
+            "Any pain or discomfort during exercise"
+        ],
+        when_to_see=[
+            "If you have health concerns or chronic conditions",
+            "Persistent pain or unusual symptoms"
+        ],
+        extra_notes=[
+            "Consistency is more important than intensity",
+            "Listen to your body and progress gradually",
+            "Consider consulting a fitness professional for guidance",
+            "Remember: any movement is better than no movement",
+            "💡 **For personalized advice, tell me your height and weight like:** 'I'm 70kg and 170cm' or 'I'm 5'8\" and 150lbs'"
+        ],
+    ),
+    "bmi_underweight": dict(
+        title="Exercise & Nutrition Plan for Healthy Weight Gain",
+        what_it_is="Based on your measurements, you're in the underweight range. Focus on building healthy muscle mass and increasing calorie intake safely.",
+        do_now=[
+            "Strength training 3-4 times per week: squats, push-ups, planks, lunges",
+            "Light cardio 2-3 times per week: walking, swimming, cycling",
+            "Eat 5-6 small meals throughout the day",
+            "Include protein with every meal: eggs, chicken, fish, beans, nuts"
+        ],
+        watch_for=[
+            "Excessive fatigue or feeling weak",
+            "Loss of appetite or difficulty eating",
+            "Joint pain during strength training"
+        ],
+        when_to_see=[
+            "If you have difficulty gaining weight despite following the plan",
+            "If you experience persistent fatigue or weakness"
+        ],
+        extra_notes=[
+            "Focus on strength training to build muscle mass",
+            "Eat calorie-dense foods: nuts, avocados, olive oil, whole grains",
+            "Stay hydrated and get adequate sleep for muscle recovery",
+            "Consider working with a nutritionist for personalized meal planning"
+        ],
+    ),
+    "bmi_normal": dict(
+        title="Exercise & Nutrition Plan for Healthy Maintenance",
+        what_it_is="Based on your measurements, you're in the healthy weight range. Maintain your current routine with balanced exercise and nutrition.",
+        do_now=[
+            "Mix cardio and strength training: 3-4 times per week",
+            "Include variety: running, cycling, swimming, weight training",
+            "Eat balanced meals with all food groups",
+            "Stay hydrated: 8-10 glasses of water daily"
+        ],
+        watch_for=[
+            "Signs of overtraining: excessive fatigue, mood changes",
+            "Weight fluctuations outside your normal range"
+        ],
+        when_to_see=[
+            "If you notice significant weight changes",
+            "If you have concerns about your fitness routine"
+        ],
+        extra_notes=[
+            "Maintain your current healthy habits",
+            "Include fruits, vegetables, lean proteins, and whole grains",
+            "Listen to your body and adjust intensity as needed",
+            "Regular health check-ups to monitor your progress"
+        ],
+    ),
+    "bmi_overweight": dict(
+        title="Exercise & Nutrition Plan for Healthy Weight Management",
+        what_it_is="Based on your measurements, you're in the overweight range. Focus on moderate cardio and strength training with balanced nutrition.",
+        do_now=[
+            "Moderate cardio 4-5 times per week: brisk walking, cycling, swimming",
+            "Strength training 2-3 times per week: bodyweight exercises",
+            "Eat smaller, more frequent meals",
+            "Focus on lean proteins, vegetables, and whole grains"
+        ],
+        watch_for=[
+            "Joint pain during exercise",
+            "Dizziness or excessive fatigue",
+            "Difficulty maintaining the exercise routine"
+        ],
+        when_to_see=[
+            "If you experience persistent joint pain",
+            "If you have heart conditions or other health concerns"
+        ],
+        extra_notes=[
+            "Start with low-impact activities to protect your joints",
+            "Reduce portion sizes and avoid processed foods",
+            "Stay consistent with your routine for best results",
+            "Consider working with a fitness professional for guidance"
+        ],
+    ),
+    "bmi_obese": dict(
+        title="Exercise & Nutrition Plan for Safe Weight Management",
+        what_it_is="Based on your measurements, you're in the obese range. Start with low-impact activities and consult a healthcare provider before beginning.",
+        do_now=[
+            "Low-impact cardio: walking, swimming, cycling (start with 10-15 minutes)",
+            "Gentle strength training: light weights, resistance bands",
+            "Eat regular, balanced meals with portion control",
+            "Stay hydrated and get adequate sleep"
+        ],
+        watch_for=[
+            "Chest pain, dizziness, or difficulty breathing",
+            "Joint pain or excessive fatigue",
+            "Any concerning symptoms during exercise"
+        ],
+        when_to_see=[
+            "Before starting any exercise program",
+            "If you experience any concerning symptoms",
+            "For personalized nutrition and exercise guidance"
+        ],
+        extra_notes=[
+            "Start slowly and gradually increase intensity",
+            "Focus on whole foods and avoid processed foods",
+            "Consider working with healthcare professionals",
+            "Set realistic goals and celebrate small victories"
+        ],
+    ),
+    "exercise_general": dict(
+        title="General Exercise Guidelines",
+        what_it_is="Safe, effective exercise recommendations for overall health and fitness.",
+        do_now=[
+            "Aim for 150 minutes of moderate exercise per week",
+            "Include both cardio and strength training",
+            "Start with activities you enjoy: walking, dancing, sports",
+            "Warm up before and cool down after exercise"
+        ],
+        watch_for=[
+            "Chest pain, dizziness, or difficulty breathing",
+            "Excessive fatigue or muscle soreness",
+            "Joint pain or injury"
+        ],
+        when_to_see=[
+            "Any concerning symptoms during exercise",
+            "If you have health conditions or concerns"
+        ],
+        extra_notes=[
+            "Start slowly and gradually increase intensity",
+            "Stay hydrated and listen to your body",
+            "Consistency is key - even 10 minutes is better than nothing",
+            "💡 **For personalized advice, tell me your height and weight like:** 'I'm 70kg and 170cm' or 'I'm 5'8\" and 150lbs'"
+        ],
+    ),
+}
+
+WEEKLY_MEAL_PLAN = {
+    "monday": {
+        "breakfast": "Arroz caldo (rice porridge) with chicken, boiled egg, and calamansi",
+        "lunch": "Grilled bangus (milkfish) with ensaladang talong, brown rice",
+        "dinner": "Sinigang na hipon (shrimp soup) with kangkong and brown rice"
+    },
+    "tuesday": {
+        "breakfast": "Tocino with garlic rice, fried egg, and atchara",
+        "lunch": "Chicken adobo with steamed vegetables and brown rice",
+        "dinner": "Ginataang gulay (vegetables in coconut milk) with grilled fish"
+    },
+    "wednesday": {
+        "breakfast": "Champorado (chocolate rice porridge) with tuyo (dried fish)",
+        "lunch": "Pancit bihon with mixed vegetables and lean meat",
+        "dinner": "Tinola (chicken soup) with malunggay leaves and brown rice"
+    },
+    "thursday": {
+        "breakfast": "Tapsilog (beef tapa, sinangag, itlog) with fresh tomatoes",
+        "lunch": "Grilled tilapia with ensaladang mangga and brown rice",
+        "dinner": "Pinakbet (mixed vegetables) with grilled pork and brown rice"
+    },
+    "friday": {
+        "breakfast": "Longganisa with garlic rice, fried egg, and fresh fruits",
+        "lunch": "Lumpiang sariwa (fresh spring rolls) with peanut sauce",
+        "dinner": "Sinigang na baboy (pork soup) with vegetables and brown rice"
+    },
+    "saturday": {
+        "breakfast": "Tocino with garlic rice, fried egg, and fresh mango",
+        "lunch": "Grilled chicken inasal with atchara and brown rice",
+        "dinner": "Kare-kare (oxtail stew) with bagoong and brown rice"
+    },
+    "sunday": {
+        "breakfast": "Silog (garlic rice and egg) with your choice of meat",
+        "lunch": "Lechon kawali with ensaladang talong and brown rice",
+        "dinner": "Nilagang baka (beef soup) with vegetables and brown rice"
+    }
+}
+
+HYDRATION_TIPS = [
+    "Drink 8-10 glasses of water daily (2-2.5 liters)",
+    "Start your day with a glass of water",
+    "Drink water before, during, and after exercise",
+    "Include hydrating foods: watermelon, cucumber, oranges",
+    "Limit caffeine and alcohol as they can dehydrate"
+]
+
+HEALTHY_FOODS = {
+    "proteins": "Bangus (milkfish), tilapia, chicken, pork, beef, eggs, tokwa (tofu), monggo (mung beans)",
+    "carbohydrates": "Brown rice, kamote (sweet potato), saba (banana), oats, whole grain bread, fruits",
+    "vegetables": "Kangkong, malunggay, talong (eggplant), okra, ampalaya (bitter gourd), tomatoes, leafy greens",
+    "fats": "Coconut oil, olive oil, nuts, seeds, fatty fish (bangus, tilapia), avocado",
+    "dairy": "Fresh milk, keso (cheese), yogurt (in moderation)"
+}
+
+
+def _meal_plan_text() -> str:
+    lines = ["**Weekly Healthy Meal Plan (Philippine Cuisine):**\n"]
+    for day, meals in WEEKLY_MEAL_PLAN.items():
+        lines.append(
+            f"**{day.capitalize()}:**\n"
+            f"**Breakfast:** {meals['breakfast']}\n"
+            f"**Lunch:** {meals['lunch']}\n"
+            f"**Dinner:** {meals['dinner']}\n"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def _foods_text() -> str:
+    lines = [f"**{category.capitalize()}:** {foods}\n" for category, foods in HEALTHY_FOODS.items()]
+    return "**Healthy Food Categories (Philippine Foods):**\n\n" + "".join(lines)
+
+
+NUTRITION_SECTIONS = dict(
+    title="Nutrition & Hydration Guide",
+    what_it_is="Comprehensive nutrition advice with weekly meal plans and healthy food recommendations for optimal health and wellness.",
+    do_now=[
+        "Plan your meals for the week using the provided meal plan",
+        "Include a variety of colors in your meals (rainbow of fruits and vegetables)",
+        "Eat regular meals and healthy snacks to maintain energy",
+        "Stay hydrated throughout the day"
+    ],
+    watch_for=[
+        "Signs of dehydration: dry mouth, dark urine, fatigue",
+        "Food allergies or intolerances",
+        "Sudden changes in appetite or weight"
+    ],
+    when_to_see=[
+        "If you have specific dietary restrictions or allergies",
+        "If you experience digestive issues with certain foods",
+        "For personalized nutrition counseling"
+    ],
+    extra_notes=[
+        _meal_plan_text(),
+        _foods_text(),
+        "**Hydration Tips:**",
+        *HYDRATION_TIPS,
+        "Remember: Balance is key - enjoy a variety of foods in moderation"
+    ],
+)
+
+# Every canned answer the offline path can give, by response key.
+STATIC_SECTIONS = {
+    **{intent["key"]: intent["sections"] for intent in CONDITION_INTENTS},
+    **EXERCISE_PLANS,
+    "nutrition": NUTRITION_SECTIONS,
+    "general_wellness": GENERAL_WELLNESS_SECTIONS,
+}
+
+
+def _build_index(intents: List[dict]) -> Dict[str, List[Tuple[dict, Tuple[str, ...]]]]:
+    # Tuple triggers are indexed under their first keyword and confirmed
+    # against the rest at lookup time.
+    index: Dict[str, List[Tuple[dict, Tuple[str, ...]]]] = {}
+    for intent in intents:
+        for trigger in intent["triggers"]:
+            keywords = (trigger,) if isinstance(trigger, str) else tuple(trigger)
+            index.setdefault(keywords[0], []).append((intent, keywords))
+    return index
+
+
+TRIGGER_INDEX = _build_index(CONDITION_INTENTS)
+
+INTENT_TRIGGERS = sorted({
+    keyword
+    for intent in CONDITION_INTENTS
+    for trigger in intent["triggers"]
+    for keyword in ((trigger,) if isinstance(trigger, str) else trigger)
+})
+
+
+# Whole-word triggers for the pre-router, by intent key; same tuple convention as "triggers".
+ROUTE_TRIGGERS = {
+    "cut": ["cut", "cuts", "wound", "wounds"],
+    "cold": ["have a cold", "has a cold", "had a cold", "got a cold", "get a cold", "getting a cold",
+             "catch a cold", "catching a cold", "caught a cold", "relieve a cold", "treat a cold", "colds", "common cold", "head cold", "cough", "coughs", "coughing"],
+    "stress": ["stress", "stressed", "anxiety", "anxious", "panic attack", "panic attacks"],
+    "fever": ["fever", "high temperature"],
+    "sore_throat": ["sore throat", "throat pain"],
+    "headache": ["headache", "headaches", "migraine", "migraines", "head pain"],
+    "stomach_ache": ["stomach ache", "stomachache", "abdominal pain"],
+    "diarrhea": ["diarrhea", "loose stools"],
+    "burn": ["burn", "burns", "burned", "burnt", "scald", "scalded"],
+    "nosebleed": ["nosebleed", "nosebleeds", "nose bleed"],
+    "fainting": ["faint", "fainting", "passed out", "syncope"],
+    "dehydration": ["dehydration", "dehydrated"],
+    "food_poisoning": ["food poisoning", ("vomit", "diarrhea"), ("vomiting", "diarrhea")],
+    "dengue": ["dengue"],
+    "heat_exhaustion": ["heat exhaustion", ("heat", "dizzy")],
+}
+
+ROUTE_INDEX = _build_index([
+    {**intent, "triggers": ROUTE_TRIGGERS[intent["key"]]} for intent in CONDITION_INTENTS
+])
+
+# Warning signs from each intent's "watch for" / "when to see" sections, as whole words.
+ROUTE_RED_FLAGS = {
+    "cut": ["pus", "infected", "infection", "smells", "smelly", "red streaks", "spreading", "swollen", "deep",
+            "gaping", "won't stop bleeding", "keeps bleeding", "dirty", "rusty", "tetanus"],
+    "cold": ["high fever", "chest pain", "trouble breathing", "hard to breathe", "short of breath",
+             "shortness of breath", "confused", "confusion", "more than a week", "getting worse"],
+    "stress": ["self-harm", "hurt myself", "hopeless", "can't cope", "every day", "interfere", "interferes"],
+    "fever": ["very high", "stiff neck", "rash", "confused", "confusion", "severe headache", "trouble breathing",
+              "chest pain", "vomiting", "keeps vomiting", "seizure", "3 days", "three days", "very unwell"],
+    "sore_throat": ["severe", "drooling", "trouble breathing", "can't swallow", "rash", "high fever"],
+    "headache": ["worst", "sudden", "suddenly", "hit my head", "head injury", "stiff neck", "fever", "confused",
+                 "confusion", "weakness", "numb", "numbness", "blurry", "blurred", "vision", "double vision"],
+    "stomach_ache": ["severe", "blood", "bloody", "black stool", "fever", "keeps vomiting", "vomiting blood"],
+    "diarrhea": ["blood", "bloody", "black stool", "high fever", "dizzy", "dizziness", "very dry mouth"],
+    "burn": ["large area", "blister", "blisters", "face", "genitals", "infected", "infection", "worsening"],
+    "nosebleed": ["won't stop", "20 minutes", "blood thinners", "dizzy", "dizziness", "injury", "frequent"],
+    "fainting": ["head injury", "hit my head", "chest pain", "short of breath", "shortness of breath",
+                 "confused", "confusion", "again", "repeated", "keep fainting"],
+    "dehydration": ["very dry mouth", "no urine", "not peeing", "fainting", "fainted", "confused", "confusion",
+                    "can't keep"],
+    "food_poisoning": ["blood", "bloody", "black stool", "high fever", "more than 2 days"],
+    "dengue": ["bleeding", "gums", "eye pain", "severe headache", "severe", "warning signs"],
+    "heat_exhaustion": ["confused", "confusion", "fainting", "fainted", "very high temperature", "no sweating",
+                        "not sweating", "stopped sweating"],
+}
+
+
+def _whole_words(keywords) -> "re.Pattern":
+    # A lookahead so overlapping phrases ("panic attack" inside "panic attacks") are all reported.
+    alternatives = "|".join(map(re.escape, sorted(set(keywords), key=len, reverse=True)))
+    return re.compile(r"(?=\b(" + alternatives + r")\b)")
+
+
+_ROUTE_PATTERN = _whole_words(ROUTE_INDEX.keys() | {
+    keyword for keywords in ROUTE_TRIGGERS.values() for trigger in keywords
+    if not isinstance(trigger, str) for keyword in trigger
+})
+_RED_FLAG_PATTERN = _whole_words(flag for flags in ROUTE_RED_FLAGS.values() for flag in flags)
+
+
+@lru_cache(maxsize=1024)
+def route_keywords(text: str) -> FrozenSet[str]:
+    """Route trigger keywords that appear in ``text`` as whole words."""
+    return frozenset(_ROUTE_PATTERN.findall(text.lower()))
+
+
+@lru_cache(maxsize=1024)
+def red_flags(text: str, key: str) -> FrozenSet[str]:
+    """Warning signs of intent ``key`` that ``text`` describes."""
+    return frozenset(_RED_FLAG_PATTERN.findall(text.lower())) & frozenset(ROUTE_RED_FLAGS[key])
+
+
+def match_intent(found: FrozenSet[str]) -> Optional[dict]:
+    """Return the highest-priority intent triggered by the matched keywords."""
+    best = None
+    for keyword in found:
+        for intent, keywords in TRIGGER_INDEX.get(keyword, ()):
+            if best is not None and intent["priority"] >= best["priority"]:
+                continue
+            if all(k in found for k in keywords[1:]):
+                best = intent
+    return best
+
+
+def matching_intents(found: FrozenSet[str], index=TRIGGER_INDEX) -> List[dict]:
+    """Every intent triggered by the matched keywords, highest priority first."""
+    matched = {}
+    for keyword in found:
+        for intent, keywords in index.get(keyword, ()):
+            if all(k in found for k in keywords[1:]):
+                matched[intent["key"]] = intent
+    return sorted(matched.values(), key=lambda intent: intent["priority"])
@@ -0,0 +1,353 @@
+"""Gateway to the OpenAI chat API.
+
+One gateway per process holds a pooled HTTP client shared by every session,
+applies explicit connect/read timeouts, retries 429/5xx and connection errors
+with jittered exponential backoff, and gives up once the per-call budget is
+spent so the caller can fall back to the rule-based answer. A circuit breaker
+(``carepal.breaker``) short-circuits calls while the API is degraded. Sync
+and async entry points share the same policy and latency metrics.
+
+Configured through environment variables:
+
+- ``OPENAI_BASE_URL``: API root, e.g. a local stub server (see ``carepal.stub_server``)
+- ``CAREPAL_LLM_CONNECT_TIMEOUT`` / ``CAREPAL_LLM_READ_TIMEOUT``: seconds
+- ``CAREPAL_LLM_MAX_RETRIES``: retries after the first attempt
+- ``CAREPAL_LLM_BUDGET``: seconds a call may take in total, retries included
+"""
+import asyncio
+import importlib.util
+import os
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterator, List, NamedTuple, Optional
+
+from carepal import metrics
+from carepal.breaker import OPEN, BreakerConfig, CircuitBreaker
+
+if TYPE_CHECKING:
+    import openai
+
+# The SDK takes about half a second to import, so it is only loaded once a
+# call is actually made; an offline process never pays for it.
+OPENAI_SDK_AVAILABLE = importlib.util.find_spec("openai") is not None
+
+
+def _sdk():
+    import openai
+    return openai
+
+
+class LLMUnavailable(RuntimeError):
+    """No reply could be obtained within the call budget."""
+
+
+class GatewayConfig(NamedTuple):
+    base_url: Optional[str] = None
+    connect_timeout: float = 3.0
+    read_timeout: float = 20.0
+    max_retries: int = 2
+    backoff_base: float = 0.5
+    backoff_cap: float = 4.0
+    budget: float = 25.0
+
+    @classmethod
+    def from_env(cls) -> "GatewayConfig":
+        return cls(
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+            connect_timeout=float(os.getenv("CAREPAL_LLM_CONNECT_TIMEOUT", "3")),
+            read_timeout=float(os.getenv("CAREPAL_LLM_READ_TIMEOUT", "20")),
+            max_retries=int(os.getenv("CAREPAL_LLM_MAX_RETRIES", "2")),
+            budget=float(os.getenv("CAREPAL_LLM_BUDGET", "25")),
+        )
+
+
+class LatencyStats:
+    """Call counts, prompt tokens and a rolling window of call latencies."""
+
+    def __init__(self, window: int = 500):
+        self._latencies: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+
+    def record(self, seconds: float, ok: bool, retries: int,
+               prompt_tokens: Optional[int] = None, cached_tokens: Optional[int] = None) -> None:
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens or 0
+            self.cached_prompt_tokens += cached_tokens or 0
+            self.retries += retries
+            if not ok:
+                self.errors += 1
+            self._latencies.append(seconds)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            calls, errors, retries = self.calls, self.errors, self.retries
+            prompt_tokens, cached_tokens = self.prompt_tokens, self.cached_prompt_tokens
+
+        def pct(p: float) -> float:
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else 0.0
+
+        return {
+            "calls": calls,
+            "errors": errors,
+            "retries": retries,
+            "p50_seconds": pct(0.5),
+            "p95_seconds": pct(0.95),
+            "last_seconds": self._latencies[-1] if self._latencies else 0.0,
+            "prompt_tokens": prompt_tokens,
+            "cached_prompt_tokens": cached_tokens,
+            "prompt_cache_hit_rate": cached_tokens / prompt_tokens if prompt_tokens else 0.0,
+        }
+
+
+def _retryable(exc: Exception) -> bool:
+    openai = _sdk()
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    # Covers APITimeoutError, which subclasses it.
+    return isinstance(exc, openai.APIConnectionError)
+
+
+class LLMGateway:
+    def __init__(self, config: Optional[GatewayConfig] = None, breaker: Optional[CircuitBreaker] = None):
+        self.config = config or GatewayConfig.from_env()
+        self.metrics = LatencyStats()
+        self.breaker = breaker or CircuitBreaker(BreakerConfig.from_env())
+        self._lock = threading.Lock()
+        self._http = None
+        self._clients: Dict[str, "openai.OpenAI"] = {}
+        # Async connection pools belong to the event loop that created them.
+        self._async_pools: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    def _api_key(self) -> str:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not OPENAI_SDK_AVAILABLE or not api_key:
+            raise LLMUnavailable("OpenAI API not configured")
+        if not self.breaker.allow():
+            raise LLMUnavailable("OpenAI API circuit is open")
+        return api_key
+
+    def _finish(self, start: float, ok: bool, retries: int, first_chunk: Optional[float] = None,
+                usage=None, abandoned: bool = False) -> None:
+        """Record one call. ``abandoned`` means the reader closed the stream early, e.g. on a Streamlit
+        rerun: not an upstream failure, and before the first chunk not a success either."""
+        if abandoned and first_chunk is None:
+            self.breaker.release()
+            return
+        ok = ok or abandoned
+        elapsed = time.monotonic() - start
+        first_token = None if first_chunk is None else first_chunk - start
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        # Input tokens the provider served from its prompt-prefix cache.
+        cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+        self.metrics.record(elapsed, ok=ok, retries=retries, prompt_tokens=prompt_tokens, cached_tokens=cached_tokens)
+        # Streams are judged on time to first chunk, not on how long the answer is.
+        self.breaker.record(ok, elapsed if first_token is None else first_token)
+        metrics.record_llm_call(elapsed, ok, first_token, prompt_tokens,
+                                getattr(usage, "completion_tokens", None), cached_tokens)
+
+    def _client(self, api_key: str) -> "openai.OpenAI":
+        # One SDK client per key, all sharing a single connection pool; the SDK's
+        # own retries are off because the gateway owns the retry policy.
+        openai = _sdk()
+        with self._lock:
+            if self._http is None:
+                self._http = openai.DefaultHttpxClient()
+            if api_key not in self._clients:
+                self._clients[api_key] = openai.OpenAI(
+                    api_key=api_key, base_url=self.config.base_url, max_retries=0, http_client=self._http
+                )
+            return self._clients[api_key]
+
+    def _async_client(self, api_key: str) -> "openai.AsyncOpenAI":
+        openai = _sdk()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            pool = self._async_pools.get(loop)
+            if pool is None:
+                pool = self._async_pools[loop] = (openai.DefaultAsyncHttpxClient(), {})
+            http, clients = pool
+            if api_key not in clients:
+                clients[api_key] = openai.AsyncOpenAI(
+                    api_key=api_key, base_url=self.config.base_url, max_retries=0, http_client=http
+                )
+            return clients[api_key]
+
+    def _timeout(self, deadline: float) -> "openai.Timeout":
+        remaining = max(0.1, deadline - time.monotonic())
+        return _sdk().Timeout(
+            min(self.config.read_timeout, remaining), connect=min(self.config.connect_timeout, remaining)
+        )
+
+    def _retry_delay(self, exc: Exception, attempt: int, deadline: float) -> Optional[float]:
+        """Seconds to wait before retrying, or None to give up now."""
+        if attempt >= self.config.max_retries or not _retryable(exc):
+            return None
+        delay = random.uniform(0, min(self.config.backoff_cap, self.config.backoff_base * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def chat(self, messages: List[Dict[str, str]], model: str, temperature: float = 0.4) -> str:
+        client = self._client(self._api_key())
+        start = time.monotonic()
+        deadline = start + self.config.budget
+        attempt = 0
+        while True:
+            try:
+                resp = client.chat.completions.create(
+                    model=model, messages=messages, temperature=temperature, timeout=self._timeout(deadline)
+                )
+            except Exception as exc:
+                delay = self._retry_delay(exc, attempt, deadline)
+                if delay is None:
+                    self._finish(start, ok=False, retries=attempt)
+                    raise LLMUnavailable(str(exc)) from exc
+                attempt += 1
+                time.sleep(delay)
+                continue
+            self._finish(start, ok=True, retries=attempt, usage=resp.usage)
+            return resp.choices[0].message.content
+
+    def stream_chat(self, messages: List[Dict[str, str]], model: str, temperature: float = 0.4) -> Iterator[str]:
+        """Yield reply text as it arrives. Retries happen only before the first chunk."""
+        client = self._client(self._api_key())
+        start = time.monotonic()
+        deadline = start + self.config.budget
+        attempt = 0
+        while True:
+            try:
+                stream = client.chat.completions.create(
+                    model=model, messages=messages, temperature=temperature, stream=True,
+                    stream_options={"include_usage": True}, timeout=self._timeout(deadline),
+                )
+                break
+            except Exception as exc:
+                delay = self._retry_delay(exc, attempt, deadline)
+                if delay is None:
+                    self._finish(start, ok=False, retries=attempt)
+                    raise LLMUnavailable(str(exc)) from exc
+                attempt += 1
+                time.sleep(delay)
+        ok = False
+        abandoned = False
+        first_chunk = None
+        usage = None
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first_chunk is None:
+                        first_chunk = time.monotonic()
+                    yield chunk.choices[0].delta.content
+                # With include_usage the API sends token counts in a final chunk without choices.
+                usage = getattr(chunk, "usage", None) or usage
+            ok = True
+        except GeneratorExit:
+            abandoned = True
+            raise
+        finally:
+            self._finish(start, ok=ok, retries=attempt, first_chunk=first_chunk, usage=usage, abandoned=abandoned)
+
+    async def achat(self, messages: List[Dict[str, str]], model: str, temperature: float = 0.4) -> str:
+        client = self._async_client(self._api_key())
+        start = time.monotonic()
+        deadline = start + self.config.budget
+        attempt = 0
+        while True:
+            try:
+                resp = await client.chat.completions.create(
+                    model=model, messages=messages, temperature=temperature, timeout=self._timeout(deadline)
+                )
+            except Exception as exc:
+                delay = self._retry_delay(exc, attempt, deadline)
+                if delay is None:
+                    self._finish(start, ok=False, retries=attempt)
+                    raise LLMUnavailable(str(exc)) from exc
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            self._finish(start, ok=True, retries=attempt, usage=resp.usage)
+            return resp.choices[0].message.content
+
+    async def astream_chat(self, messages: List[Dict[str, str]], model: str,
+                           temperature: float = 0.4) -> AsyncIterator[str]:
+        client = self._async_client(self._api_key())
+        start = time.monotonic()
+        deadline = start + self.config.budget
+        attempt = 0
+        while True:
+            try:
+                stream = await client.chat.completions.create(
+                    model=model, messages=messages, temperature=temperature, stream=True,
+                    stream_options={"include_usage": True}, timeout=self._timeout(deadline),
+                )
+                break
+            except Exception as exc:
+                delay = self._retry_delay(exc, attempt, deadline)
+                if delay is None:
+                    self._finish(start, ok=False, retries=attempt)
+                    raise LLMUnavailable(str(exc)) from exc
+                attempt += 1
+                await asyncio.sleep(delay)
+        ok = False
+        abandoned = False
+        first_chunk = None
+        usage = None
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first_chunk is None:
+                        first_chunk = time.monotonic()
+                    yield chunk.choices[0].delta.content
+                # With include_usage the API sends token counts in a final chunk without choices.
+                usage = getattr(chunk, "usage", None) or usage
+            ok = True
+        except (GeneratorExit, asyncio.CancelledError):
+            abandoned = True
+            raise
+        finally:
+            self._finish(start, ok=ok, retries=attempt, first_chunk=first_chunk, usage=usage, abandoned=abandoned)
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
+
+
+def llm_available() -> bool:
+    return OPENAI_SDK_AVAILABLE and bool(os.getenv("OPENAI_API_KEY"))
+
+
+def warm_up() -> None:
+    """Import the SDK now, so the first request does not pay for it inside its deadline."""
+    if llm_available():
+        _sdk()
+
+
+def llm_circuit_open() -> bool:
+    """True while the breaker is routing every request to the offline answers."""
+    return get_gateway().breaker.state == OPEN
+
+
+def openai_chat(messages, model_name):
+    return get_gateway().chat(messages, model_name)
+
+
+def openai_chat_stream(messages, model_name):
+    return get_gateway().stream_chat(messages, model_name)
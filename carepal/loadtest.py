@@ -0,0 +1,114 @@
+"""Burst load test: many sessions asking the same few questions at the same moment.
+
+Runs each burst against the local stub LLM (``carepal.stub_server``) twice,
+with request coalescing off and on, and reports how many calls reached the
+upstream and the latency the users saw. ``--mode async`` drives
+``respond_async`` on one event loop like the HTTP API does; ``--mode threads``
+makes the same streamed calls as the Streamlit app, one thread per session.
+The response cache and the pre-router are off so every question needs the AI,
+and the rate limiter is off so every request is counted.
+
+    python -m carepal.loadtest --users 50 --questions 3 --delay 0.5
+"""
+import argparse
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+# Sidebar examples that reach the AI ("Healthy snacks for studying" is turned away as off-topic).
+EXAMPLE_QUESTIONS = [
+    "Tips to relieve a cold",
+    "First aid for a small cut",
+    "Quick stress-relief exercises",
+    "How do I sleep better",
+]
+
+
+async def _async_burst(questions: List[str], persona: str) -> List[float]:
+    from carepal.pipeline import respond_async
+
+    async def one(question: str) -> float:
+        start = time.perf_counter()
+        await respond_async(question, persona)
+        return time.perf_counter() - start
+
+    return list(await asyncio.gather(*(one(q) for q in questions)))
+
+
+def _thread_burst(questions: List[str], persona: str) -> List[float]:
+    from carepal.history import build_chat_messages
+    from carepal.llm import get_gateway
+    from carepal.pipeline import DEFAULT_MODEL, flight_key
+    from carepal.prompts import build_system_prompt, system_prompt_hash
+    from carepal.singleflight import LLM_FLIGHTS
+
+    gateway = get_gateway()
+    barrier = threading.Barrier(len(questions))
+
+    def one(question: str) -> float:
+        messages = build_chat_messages(build_system_prompt(persona), [{"role": "user", "content": question}])
+        key = flight_key(question, persona, DEFAULT_MODEL, system_prompt_hash(persona), messages)
+        barrier.wait()
+        start = time.perf_counter()
+        "".join(LLM_FLIGHTS.stream(key, lambda: gateway.stream_chat(messages, DEFAULT_MODEL)))
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(len(questions)) as pool:
+        return list(pool.map(one, questions))
+
+
+def run_burst(users: int, questions: int, mode: str, coalesce: bool, state,
+              persona: str = "Clinic Nurse") -> Dict[str, float]:
+    os.environ["CAREPAL_COALESCE"] = "1" if coalesce else "0"
+    asked = [EXAMPLE_QUESTIONS[i % questions] for i in range(users)]
+    before = state.requests
+    start = time.perf_counter()
+    if mode == "async":
+        latencies = asyncio.run(_async_burst(asked, persona))
+    else:
+        latencies = _thread_burst(asked, persona)
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": users,
+        "upstream_calls": state.requests - before,
+        "p50_ms": latencies[len(latencies) // 2] * 1e3,
+        "p95_ms": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] * 1e3,
+        "wall_s": wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50, help="concurrent sessions in the burst")
+    parser.add_argument("--questions", type=int, default=3, choices=range(1, len(EXAMPLE_QUESTIONS) + 1),
+                        help="distinct questions the sessions ask")
+    parser.add_argument("--delay", type=float, default=0.5, help="stub LLM latency per call, in seconds")
+    parser.add_argument("--mode", choices=["async", "threads", "both"], default="both")
+    args = parser.parse_args()
+
+    from carepal.stub_server import start_stub_server
+
+    for name, value in {"CAREPAL_CACHE_BACKEND": "off", "CAREPAL_SEMANTIC_CACHE": "0", "CAREPAL_ROUTER": "0",
+                        "CAREPAL_SPECULATIVE": "0", "CAREPAL_RATE_LIMIT": "0",
+                        "OPENAI_API_KEY": "sk-loadtest"}.items():
+        os.environ[name] = value
+    server, state = start_stub_server(delay=args.delay)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    modes = ["async", "threads"] if args.mode == "both" else [args.mode]
+    print(f"{'mode':<8} {'coalesce':<9} {'requests':>8} {'upstream':>8} {'p50 ms':>8} {'p95 ms':>8} {'wall s':>7}")
+    try:
+        for mode in modes:
+            for coalesce in (False, True):
+                r = run_burst(args.users, args.questions, mode, coalesce, state)
+                print(f"{mode:<8} {'on' if coalesce else 'off':<9} {r['requests']:>8} {r['upstream_calls']:>8} "
+                      f"{r['p50_ms']:>8.0f} {r['p95_ms']:>8.0f} {r['wall_s']:>7.2f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
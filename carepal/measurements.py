@@ -0,0 +1,98 @@
+"""Weight and height mentions in a message, parsed once into metric units.
+
+One precompiled pattern finds every measurement in a single pass: metric
+and imperial units, feet and inches written as ``5'8"`` or ``5 ft 8 in``,
+and decimal commas (``72,5 kg``). Units only count as whole words, so the
+``m`` in "5 minutes" is not a height. A bare ``in`` counts only after feet,
+since "2 in a row" is not a measurement.
+"""
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+
+WEIGHT = "weight"
+HEIGHT = "height"
+
+# Upper bounds of the underweight, normal and overweight BMI bands.
+BMI_BOUNDS = (18.5, 25.0, 30.0)
+BMI_CATEGORIES = ("underweight", "normal", "overweight", "obese")
+
+_NUMBER = r"\d{1,3}(?:,\d{3})+(?![\d,])|\d+(?:[.,]\d+)?"
+_WEIGHT_UNITS = r"kgs?|kilos?|kilograms?|lbs?|pounds?"
+_MEASUREMENT = re.compile(rf"""
+    (?<![\w.,])(?P<number>{_NUMBER})\s*
+    (?:
+        (?P<feet>'|ft\b|feet\b|foot\b)
+        (?:\s*(?P<inches>\d{{1,2}}(?:[.,]\d+)?)(?!\d)(?!\s*(?:{_WEIGHT_UNITS}|cm|m)\b)
+           \s*(?:"|''|in\b|inch(?:es)?\b)?)?
+      | (?P<unit>{_WEIGHT_UNITS}|cm|centimet(?:er|re)s?|m|met(?:er|re)s?|inch(?:es)?|")(?![a-z])
+    )
+""", re.IGNORECASE | re.VERBOSE)
+
+_THOUSANDS = re.compile(r"\d{1,3}(?:,\d{3})+")
+
+
+class Measurement(NamedTuple):
+    kind: str  # WEIGHT (kilograms) or HEIGHT (metres)
+    value: float
+    span: Tuple[int, int]
+
+
+class BodyStats(NamedTuple):
+    measurements: Tuple[Measurement, ...]
+    weight_kg: Optional[float] = None
+    height_m: Optional[float] = None
+    bmi: Optional[float] = None
+    bmi_category: Optional[str] = None
+
+
+def _number(text: str) -> float:
+    if _THOUSANDS.fullmatch(text):
+        return float(text.replace(",", ""))
+    return float(text.replace(",", "."))
+
+
+def _unit(unit: str) -> Tuple[str, float]:
+    """Kind of measurement and the factor to kilograms or metres."""
+    unit = unit.lower()
+    if unit.startswith(("kg", "kilo")):
+        return WEIGHT, 1.0
+    if unit.startswith(("lb", "pound")):
+        return WEIGHT, 0.453592
+    if unit.startswith(("cm", "centi")):
+        return HEIGHT, 0.01
+    if unit.startswith("inch") or unit == '"':
+        return HEIGHT, 0.0254
+    return HEIGHT, 1.0
+
+
+def bmi_category(bmi: float) -> str:
+    for bound, category in zip(BMI_BOUNDS, BMI_CATEGORIES):
+        if bmi < bound:
+            return category
+    return BMI_CATEGORIES[-1]
+
+
+def find_measurements(text: str) -> Tuple[Measurement, ...]:
+    found = []
+    for match in _MEASUREMENT.finditer(text):
+        number = _number(match.group("number"))
+        if match.group("feet"):
+            inches = _number(match.group("inches")) if match.group("inches") else 0.0
+            found.append(Measurement(HEIGHT, number * 0.3048 + inches * 0.0254, match.span()))
+            continue
+        kind, factor = _unit(match.group("unit"))
+        found.append(Measurement(kind, number * factor, match.span()))
+    return tuple(found)
+
+
+@lru_cache(maxsize=1024)
+def parse_body(text: str) -> BodyStats:
+    """The first weight and height mentioned in ``text`` and the BMI they give."""
+    measurements = find_measurements(text)
+    weight = next((m.value for m in measurements if m.kind == WEIGHT), None)
+    height = next((m.value for m in measurements if m.kind == HEIGHT), None)
+    if not weight or not height:
+        return BodyStats(measurements, weight, height)
+    bmi = weight / (height ** 2)
+    return BodyStats(measurements, weight, height, bmi, bmi_category(bmi))
@@ -0,0 +1,241 @@
+"""Per-stage latency, branch counts and LLM usage in Prometheus text format.
+
+Off unless ``CAREPAL_METRICS=1``; while off, ``stage()`` hands back a shared
+no-op context manager and every recorder returns immediately, so the
+instrumented code pays one attribute check per call.
+
+The HTTP API serves ``GET /metrics``. The Streamlit process has no HTTP hook
+of its own, so set ``CAREPAL_METRICS_PORT`` and ``start_metrics_server()``
+serves the same page from a background thread on
+``CAREPAL_METRICS_HOST`` (``127.0.0.1`` by default).
+
+Metrics:
+
+- ``carepal_replies_total{branch}`` / ``carepal_reply_seconds{branch}``: answers by the branch that produced them
+- ``carepal_stage_seconds{stage}``: classify, route, prompt, cache, llm and render
+- ``carepal_llm_seconds{outcome}`` and ``carepal_llm_first_token_seconds``: upstream calls, retries included
+- ``carepal_llm_coalesced_total``: AI requests answered by an identical request already in flight
+- ``carepal_llm_tokens_total{kind}``: prompt, cached_prompt and completion tokens reported by the API;
+  cached_prompt over prompt is the provider's prompt-cache hit rate
+- ``carepal_ratelimit_queue_depth``: AI requests waiting for rate-limit quota
+- ``carepal_ratelimit_wait_seconds``: time admitted requests waited for quota
+- ``carepal_ratelimit_shed_total{scope}``: requests answered locally because the global or session quota
+  would have kept them waiting too long
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_enabled = os.getenv("CAREPAL_METRICS", "0") == "1"
+_NOOP = nullcontext()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(flag: bool) -> None:
+    global _enabled
+    _enabled = flag
+
+
+def _labels(names: Sequence[str], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {value:g}")
+        return "\n".join(lines)
+
+
+class Gauge:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def render(self) -> str:
+        with self._lock:
+            value = self._value
+        return "\n".join([f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {value:g}"])
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # Per label set: count per bucket (last slot is +Inf), sum of observations.
+        self._series: Dict[Tuple[str, ...], Tuple[list, list]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1][0] += value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.label_names + ("le",)
+        with self._lock:
+            for labels, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{self.name}_bucket{_labels(names, labels + (le,))} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total[0]:.6f}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return "\n".join(lines)
+
+
+REPLIES = Counter("carepal_replies_total", "Replies by the branch that answered.", ["branch"])
+REPLY_SECONDS = Histogram("carepal_reply_seconds", "Time to produce a reply, by branch.", ["branch"])
+STAGE_SECONDS = Histogram("carepal_stage_seconds", "Time spent in each stage of a turn.", ["stage"])
+LLM_SECONDS = Histogram("carepal_llm_seconds", "Upstream LLM call latency including retries.", ["outcome"])
+LLM_FIRST_TOKEN = Histogram("carepal_llm_first_token_seconds", "Time to the first streamed token.")
+LLM_TOKENS = Counter("carepal_llm_tokens_total", "Tokens reported by the LLM API.", ["kind"])
+LLM_COALESCED = Counter("carepal_llm_coalesced_total", "AI requests that shared an identical request in flight.")
+RATE_QUEUE_DEPTH = Gauge("carepal_ratelimit_queue_depth", "AI requests waiting for rate-limit quota.")
+RATE_WAIT_SECONDS = Histogram("carepal_ratelimit_wait_seconds", "Time admitted AI requests waited for quota.")
+RATE_SHED = Counter("carepal_ratelimit_shed_total", "AI requests shed to the local answer, by exhausted quota.",
+                    ["scope"])
+ALL_METRICS = [REPLIES, REPLY_SECONDS, STAGE_SECONDS, LLM_SECONDS, LLM_FIRST_TOKEN, LLM_TOKENS, LLM_COALESCED,
+               RATE_QUEUE_DEPTH, RATE_WAIT_SECONDS, RATE_SHED]
+
+
+@contextmanager
+def _timed_stage(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, name)
+
+
+def stage(name: str):
+    """Context manager timing one stage of a turn; a no-op while metrics are off."""
+    return _timed_stage(name) if _enabled else _NOOP
+
+
+def record_reply(branch: str, seconds: float) -> None:
+    if _enabled:
+        REPLIES.inc(branch)
+        REPLY_SECONDS.observe(seconds, branch)
+
+
+def record_llm_call(seconds: float, ok: bool, first_token: Optional[float] = None,
+                    prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None,
+                    cached_tokens: Optional[int] = None) -> None:
+    if not _enabled:
+        return
+    LLM_SECONDS.observe(seconds, "ok" if ok else "error")
+    if first_token is not None:
+        LLM_FIRST_TOKEN.observe(first_token)
+    if prompt_tokens:
+        LLM_TOKENS.inc("prompt", amount=prompt_tokens)
+        LLM_TOKENS.inc("cached_prompt", amount=cached_tokens or 0)
+    if completion_tokens:
+        LLM_TOKENS.inc("completion", amount=completion_tokens)
+
+
+def record_coalesced() -> None:
+    if _enabled:
+        LLM_COALESCED.inc()
+
+
+def record_shed(scope: str) -> None:
+    if _enabled:
+        RATE_SHED.inc(scope)
+
+
+@contextmanager
+def _queued(wait: float) -> Iterator[None]:
+    RATE_QUEUE_DEPTH.inc()
+    try:
+        yield
+    finally:
+        RATE_QUEUE_DEPTH.dec()
+        RATE_WAIT_SECONDS.observe(wait)
+
+
+def queued(wait: float):
+    """Context manager counting a request in the rate-limit queue while it waits ``wait`` seconds."""
+    return _queued(wait) if _enabled else _NOOP
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in ALL_METRICS) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server() -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics once per process if metrics are on and ``CAREPAL_METRICS_PORT`` is set."""
+    global _server
+    port = os.getenv("CAREPAL_METRICS_PORT")
+    if not _enabled or not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            host = os.getenv("CAREPAL_METRICS_HOST", "127.0.0.1")
+            _server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server
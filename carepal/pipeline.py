@@ -0,0 +1,298 @@
+"""One message in, one reply out: the routing shared by the UI and the HTTP API.
+
+Safety checks run first and answer from the rule-based responses. Questions
+the pre-router is confident about get their curated answer. Everything else
+goes to the AI when it is configured and healthy (cached answers first), or
+to ``local_response`` when it is not or when the rate limiter sheds the
+request.
+"""
+import asyncio
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+from carepal import metrics
+from carepal.classify import get_disallowed_category, is_disallowed, is_emergency, is_greeting, is_non_health_question
+from carepal.history import build_chat_messages
+from carepal.llm import get_gateway, llm_available, llm_circuit_open
+from carepal.prompts import build_system_prompt, system_prompt_hash, user_context
+from carepal.ratelimit import RateLimited, aacquire, aacquire_session, acquire, acquire_session
+from carepal.response_cache import ResponseCache, cache_max_history, get_response_cache, request_key
+from carepal.router import confident_route, route, routed_reply
+from carepal.singleflight import LLM_FLIGHTS, coalescing_enabled
+from carepal.speculative import AsyncPrefetch, speculation_deadline
+from carepal.responses import (
+    BLOCKLIST_RESPONSES,
+    DEFAULT_REFUSAL,
+    NON_HEALTH_RESPONSE,
+    extract_name_from_input,
+    get_emergency_response,
+    get_greeting_response,
+    local_response,
+    match_name,
+)
+
+if TYPE_CHECKING:
+    from carepal.semantic_cache import SemanticCache
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+
+class Reply(NamedTuple):
+    branch: str
+    text: str
+    user_name: Optional[str] = None
+
+
+class CacheSlot(NamedTuple):
+    response_cache: Optional[ResponseCache] = None
+    key: Optional[str] = None
+    semantic_cache: Optional["SemanticCache"] = None
+    scope: Optional[int] = None
+
+
+def preflight(user_input: str) -> Optional[Reply]:
+    """Answer emergencies, greetings, off-topic and disallowed requests without the AI."""
+    if is_emergency(user_input):
+        return Reply("emergency", get_emergency_response(user_input))
+    if is_greeting(user_input):
+        return Reply("greeting", get_greeting_response(user_input), match_name(user_input))
+    if is_non_health_question(user_input):
+        return Reply("non_health", NON_HEALTH_RESPONSE)
+    if is_disallowed(user_input):
+        category = get_disallowed_category(user_input)
+        return Reply("blocklist", BLOCKLIST_RESPONSES.get(category, DEFAULT_REFUSAL))
+    return None
+
+
+def name_acknowledgment(name: str) -> str:
+    return f"Nice to meet you, {name}! I'll remember your name for our conversation. "
+
+
+def greet_by_name(reply: str, user_name: Optional[str]) -> str:
+    """Prefix an offline reply with the user's name unless it already greets them."""
+    if not user_name:
+        return reply
+    if "What can I help you with today" in reply or "How can I help you" in reply or "What's your name" in reply:
+        return reply
+    if reply.startswith("Good ") or reply.startswith("Hello") or reply.startswith("Hi"):
+        return reply
+    return f"Hi {user_name}! {reply}"
+
+
+def _earlier_turns(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    # The prompt and user context are covered by the prompt id.
+    return [m for m in messages[1:-1] if m["role"] != "system"]
+
+
+def cache_slot(user_input: str, persona: str, model: str, prompt_id: str,
+               messages: List[Dict[str, str]]) -> CacheSlot:
+    """Where the AI answer to ``messages`` is looked up and stored, if caching is on.
+
+    The exact and semantic caches are independent; either may be off.
+    """
+    earlier = _earlier_turns(messages)
+    response_cache = get_response_cache()
+    key = None
+    if response_cache is not None:
+        key = response_cache.key_for(user_input, persona, model, prompt_id, earlier)
+    # Imported here so NumPy is only loaded once an AI answer is being cached.
+    from carepal.semantic_cache import get_semantic_cache, scope_id
+    semantic_cache = get_semantic_cache()
+    scope = None
+    if semantic_cache is not None and len(earlier) <= cache_max_history():
+        # A follow-up such as "how long does it last" only matches answers given after the same turns.
+        scope = scope_id(persona, model, prompt_id, *(f"{m['role']}:{m['content']}" for m in earlier))
+    return CacheSlot(response_cache, key, semantic_cache, scope)
+
+
+def flight_key(user_input: str, persona: str, model: str, prompt_id: str,
+               messages: List[Dict[str, str]]) -> Optional[str]:
+    """Key under which identical concurrent AI requests share one call; None when coalescing is off."""
+    if not coalescing_enabled():
+        return None
+    return request_key(user_input, persona, model, prompt_id, _earlier_turns(messages))
+
+
+def ask_ai(key: Optional[str], session: Optional[str], messages: List[Dict[str, str]], model: str) -> str:
+    """The AI's answer, shared with identical requests in flight; raises ``RateLimited`` when shed.
+
+    The session pays its own quota before joining; only the call that goes
+    upstream takes process-wide quota.
+    """
+    def call() -> str:
+        acquire(messages)
+        return get_gateway().chat(messages, model)
+
+    acquire_session(session, messages)
+    return LLM_FLIGHTS.do(key, call)
+
+
+def stream_ai(key: Optional[str], session: Optional[str], messages: List[Dict[str, str]],
+              model: str) -> Iterator[str]:
+    def call() -> Iterator[str]:
+        acquire(messages)
+        yield from get_gateway().stream_chat(messages, model)
+
+    acquire_session(session, messages)
+    yield from LLM_FLIGHTS.stream(key, call)
+
+
+async def aask_ai(key: Optional[str], session: Optional[str], messages: List[Dict[str, str]], model: str) -> str:
+    async def call() -> str:
+        await aacquire(messages)
+        return await get_gateway().achat(messages, model)
+
+    await aacquire_session(session, messages)
+    return await LLM_FLIGHTS.ado(key, call)
+
+
+async def astream_ai(key: Optional[str], session: Optional[str], messages: List[Dict[str, str]],
+                     model: str) -> AsyncIterator[str]:
+    async def call() -> AsyncIterator[str]:
+        await aacquire(messages)
+        async for chunk in get_gateway().astream_chat(messages, model):
+            yield chunk
+
+    await aacquire_session(session, messages)
+    async for chunk in LLM_FLIGHTS.astream(key, call):
+        yield chunk
+
+
+def cached_reply(slot: CacheSlot, user_input: str) -> Optional[str]:
+    reply = None
+    if slot.response_cache is not None:
+        reply = slot.response_cache.get(slot.key)
+    if reply is None and slot.scope is not None:
+        reply = slot.semantic_cache.lookup(user_input, slot.scope)
+    return reply
+
+
+def remember_reply(slot: CacheSlot, user_input: str, reply: str) -> None:
+    if slot.response_cache is not None:
+        slot.response_cache.put(slot.key, reply)
+    if slot.semantic_cache is not None and slot.scope is not None:
+        slot.semantic_cache.add(user_input, slot.scope, reply)
+
+
+def triage(user_input: str) -> Dict[str, object]:
+    """Classification flags plus the rule-based answer; never calls the AI."""
+    early = preflight(user_input)
+    reply = early or Reply("local", local_response(user_input, ""))
+    found = route(user_input)
+    return {
+        "emergency": is_emergency(user_input),
+        "greeting": is_greeting(user_input),
+        "non_health": is_non_health_question(user_input),
+        "disallowed_category": get_disallowed_category(user_input),
+        "route": found.key,
+        "route_confidence": found.confidence,
+        "branch": reply.branch,
+        "reply": reply.text,
+    }
+
+
+async def respond_async(user_input: str, persona: str, history: Sequence[Dict[str, str]] = (),
+                        user_name: Optional[str] = None, model: str = DEFAULT_MODEL,
+                        session: Optional[str] = None) -> Reply:
+    """Reply to ``user_input`` given the earlier turns in ``history``.
+
+    The returned ``user_name`` is the name to remember for the next turn.
+    ``session`` identifies the caller for the per-session rate limit.
+    """
+    started = time.perf_counter()
+    reply = await _respond_async(user_input, persona, history, user_name, model, session)
+    metrics.record_reply(reply.branch, time.perf_counter() - started)
+    return reply
+
+
+async def _respond_async(user_input: str, persona: str, history: Sequence[Dict[str, str]],
+                         user_name: Optional[str], model: str, session: Optional[str]) -> Reply:
+    with metrics.stage("classify"):
+        extracted_name = extract_name_from_input(user_input)
+        early = preflight(user_input)
+    if early is not None:
+        return early._replace(user_name=early.user_name or extracted_name or user_name)
+    user_name = extracted_name or user_name
+
+    offline = not llm_available() or llm_circuit_open()
+    if not offline:
+        with metrics.stage("route"):
+            routed = confident_route(user_input)
+    if offline or routed is not None:
+        with metrics.stage("render"):
+            reply = local_response(user_input, persona) if offline else routed_reply(routed.key, persona)
+        if extracted_name:
+            reply = name_acknowledgment(extracted_name) + reply
+        else:
+            reply = greet_by_name(reply, user_name)
+        return Reply("local" if offline else "router", reply, user_name)
+
+    with metrics.stage("prompt"):
+        turns = list(history) + [{"role": "user", "content": user_input}]
+        context = user_context(user_name, turns)
+        messages = build_chat_messages(build_system_prompt(persona), turns, context)
+    with metrics.stage("cache"):
+        prompt_id = system_prompt_hash(persona, context)
+        slot = cache_slot(user_input, persona, model, prompt_id, messages)
+        reply = cached_reply(slot, user_input)
+    if reply is not None:
+        return Reply("cache", reply, user_name)
+    key = flight_key(user_input, persona, model, prompt_id, messages)
+    deadline = speculation_deadline()
+    if deadline is not None:
+        return await _speculate(user_input, persona, user_name, model, messages, slot, key, deadline, session)
+    try:
+        with metrics.stage("llm"):
+            reply = await aask_ai(key, session, messages, model)
+    except RateLimited:
+        with metrics.stage("render"):
+            return Reply("shed", local_response(user_input, persona), user_name)
+    except Exception:
+        with metrics.stage("render"):
+            return Reply("llm_fallback", local_response(user_input, persona), user_name)
+    with metrics.stage("cache"):
+        remember_reply(slot, user_input, reply)
+    return Reply("llm", reply, user_name)
+
+
+# Late AI answers still running after their turn was answered locally.
+_late_replies: set = set()
+
+
+def _remember_late(task: "asyncio.Future", slot: CacheSlot, user_input: str) -> None:
+    _late_replies.add(task)
+
+    def done(task: "asyncio.Future") -> None:
+        _late_replies.discard(task)
+        if not task.cancelled() and task.exception() is None:
+            remember_reply(slot, user_input, task.result())
+
+    task.add_done_callback(done)
+
+
+async def _speculate(user_input: str, persona: str, user_name: Optional[str], model: str,
+                     messages: List[Dict[str, str]], slot: CacheSlot, key: Optional[str], deadline: float,
+                     session: Optional[str]) -> Reply:
+    """Start the AI, prepare the local answer meanwhile, and give up on the AI after ``deadline``."""
+    started_at = time.monotonic()
+    pending = AsyncPrefetch(astream_ai(key, session, messages, model))
+    with metrics.stage("render"):
+        local = local_response(user_input, persona)
+    with metrics.stage("llm"):
+        started = await pending.wait_first(deadline - (time.monotonic() - started_at))
+    if not started:
+        # The AI may still answer; keep that answer for the next time this is asked.
+        _remember_late(pending.task, slot, user_input)
+        return Reply("speculative_local", local, user_name)
+    try:
+        with metrics.stage("llm"):
+            reply = await pending.task
+    except RateLimited:
+        return Reply("shed", local, user_name)
+    except Exception:
+        return Reply("llm_fallback", local, user_name)
+    if not reply:
+        return Reply("llm_fallback", local, user_name)
+    with metrics.stage("cache"):
+        remember_reply(slot, user_input, reply)
+    return Reply("llm", reply, user_name)
@@ -0,0 +1,200 @@
+"""Token-bucket rate limiting of AI requests, per session and for the whole process.
+
+Every AI request takes one request and its estimated tokens from its
+session's request and token buckets, then from the process-wide pair (sized
+to the OpenAI tier's RPM/TPM). The session's quota is taken before the
+request joins an identical call in flight (``carepal.singleflight``); the
+process-wide quota only by the call that actually goes upstream. A bucket
+refills continuously and may go into debt. A request that finds a bucket
+short reserves its share anyway and waits until the debt is paid off, so
+waiting requests are served in arrival order. A session that floods runs up
+debt only in its own buckets, so its wait grows while other sessions carry
+on. When the wait would be longer than ``CAREPAL_RATE_MAX_WAIT`` the request
+is shed: it takes no quota and the caller answers with ``local_response``
+instead.
+
+Configured through environment variables:
+
+- ``CAREPAL_RATE_LIMIT``: ``1`` (default) to enforce the limits, ``0`` to turn them off
+- ``CAREPAL_RATE_RPM`` / ``CAREPAL_RATE_TPM``: process-wide requests and tokens per minute
+- ``CAREPAL_RATE_SESSION_RPM`` / ``CAREPAL_RATE_SESSION_TPM``: the same per session
+- ``CAREPAL_RATE_BURST``: seconds of quota a full bucket holds
+- ``CAREPAL_RATE_MAX_WAIT``: longest wait for quota before a request is shed, in seconds
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from carepal import metrics
+from carepal.history import history_budget, message_tokens
+from carepal.prompts import PERSONAS, build_system_prompt
+
+# Reserved for the answer on top of the prompt, since the real count is only known afterwards.
+EXPECTED_COMPLETION_TOKENS = 400
+MAX_SESSIONS = 10000
+
+
+class RateLimited(RuntimeError):
+    """The request would wait longer than the latency budget for quota."""
+
+
+class RateLimitConfig(NamedTuple):
+    rpm: float = 500.0
+    tpm: float = 200000.0
+    session_rpm: float = 10.0
+    session_tpm: float = 20000.0
+    burst: float = 10.0
+    max_wait: float = 2.0
+    # Largest request the app sends; a full token bucket always holds at least one.
+    max_request_tokens: float = 4000.0
+
+    @classmethod
+    def from_env(cls) -> "RateLimitConfig":
+        return cls(
+            rpm=float(os.getenv("CAREPAL_RATE_RPM", "500")),
+            tpm=float(os.getenv("CAREPAL_RATE_TPM", "200000")),
+            session_rpm=float(os.getenv("CAREPAL_RATE_SESSION_RPM", "10")),
+            session_tpm=float(os.getenv("CAREPAL_RATE_SESSION_TPM", "20000")),
+            burst=float(os.getenv("CAREPAL_RATE_BURST", "10")),
+            max_wait=float(os.getenv("CAREPAL_RATE_MAX_WAIT", "2")),
+            max_request_tokens=max_request_tokens(),
+        )
+
+
+class TokenBucket:
+    """Refills at ``per_minute / 60`` per second up to ``capacity``; may go negative."""
+
+    def __init__(self, per_minute: float, capacity: float, now: float):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = now
+
+    def wait_for(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` is covered, counting every earlier reservation."""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+
+class RateLimiter:
+    def __init__(self, config: RateLimitConfig = RateLimitConfig()):
+        self.config = config
+        self._lock = threading.Lock()
+        now = time.monotonic()
+        self._requests = self._bucket(config.rpm, now)
+        self._tokens = self._bucket(config.tpm, now, floor=config.max_request_tokens)
+        self._sessions: "OrderedDict[str, Tuple[TokenBucket, TokenBucket]]" = OrderedDict()
+        self.admitted = 0
+        self.shed: Dict[str, int] = {"global": 0, "session": 0}
+
+    def _bucket(self, per_minute: float, now: float, floor: float = 1.0) -> TokenBucket:
+        # A full bucket holds ``burst`` seconds of quota, and always at least one request's worth.
+        return TokenBucket(per_minute, max(floor, per_minute * self.config.burst / 60.0), now)
+
+    def _session_buckets(self, session: str, now: float) -> Tuple[TokenBucket, TokenBucket]:
+        buckets = self._sessions.get(session)
+        if buckets is None:
+            buckets = self._sessions[session] = (
+                self._bucket(self.config.session_rpm, now),
+                self._bucket(self.config.session_tpm, now, floor=self.config.max_request_tokens),
+            )
+        self._sessions.move_to_end(session)
+        while len(self._sessions) > MAX_SESSIONS:
+            self._sessions.popitem(last=False)
+        return buckets
+
+    def reserve(self, tokens: int, session: Optional[str] = None) -> float:
+        """Reserve ``session``'s quota for one request, or the process-wide quota without a session.
+
+        Returns the seconds to wait, or raises ``RateLimited`` without taking anything.
+        """
+        now = time.monotonic()
+        scope = "global" if session is None else "session"
+        with self._lock:
+            requests, token_bucket = (self._requests, self._tokens) if session is None \
+                else self._session_buckets(session, now)
+            wait = max(requests.wait_for(1, now), token_bucket.wait_for(tokens, now))
+            if wait > self.config.max_wait:
+                self.shed[scope] += 1
+                metrics.record_shed(scope)
+                raise RateLimited(f"{scope} rate limit: would wait {wait:.1f}s")
+            requests.take(1)
+            token_bucket.take(tokens)
+            if session is None:
+                self.admitted += 1
+        return wait
+
+
+def max_request_tokens() -> int:
+    """Tokens reserved for a request with a full history window and the longest system prompt."""
+    system = max(message_tokens({"role": "system", "content": build_system_prompt(p)}) for p in PERSONAS)
+    return history_budget() + system + EXPECTED_COMPLETION_TOKENS
+
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(message_tokens(m) for m in messages) + EXPECTED_COMPLETION_TOKENS
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """Return the process-wide limiter, or None when rate limiting is off."""
+    global _limiter
+    if os.getenv("CAREPAL_RATE_LIMIT", "1") != "1":
+        return None
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(RateLimitConfig.from_env())
+        return _limiter
+
+
+def _reserve(messages: List[Dict[str, str]], session: Optional[str]) -> float:
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return 0.0
+    return limiter.reserve(estimate_tokens(messages), session)
+
+
+def _wait(wait: float) -> None:
+    if wait > 0:
+        with metrics.queued(wait):
+            time.sleep(wait)
+
+
+async def _await(wait: float) -> None:
+    if wait > 0:
+        with metrics.queued(wait):
+            await asyncio.sleep(wait)
+
+
+def acquire_session(session: Optional[str], messages: List[Dict[str, str]]) -> None:
+    """Block until ``session`` may send ``messages``; raises ``RateLimited`` to shed the request.
+
+    Taken before a request joins a coalesced call, so one session running
+    over its quota does not shed the other sessions sharing that call.
+    """
+    if session is not None:
+        _wait(_reserve(messages, session))
+
+
+async def aacquire_session(session: Optional[str], messages: List[Dict[str, str]]) -> None:
+    if session is not None:
+        await _await(_reserve(messages, session))
+
+
+def acquire(messages: List[Dict[str, str]]) -> None:
+    """Block until the process may send ``messages`` upstream; raises ``RateLimited`` to shed it."""
+    _wait(_reserve(messages, None))
+
+
+async def aacquire(messages: List[Dict[str, str]]) -> None:
+    await _await(_reserve(messages, None))
@@ -0,0 +1,54 @@
+"""Markdown rendering for rule-based answers and chat history."""
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+from carepal.intents import STATIC_SECTIONS
+
+DISCLAIMER = (
+    "⚠️ I am not a medical professional. This is for general information only. "
+    "For serious or emergency situations, please consult a licensed doctor or call local emergency services."
+)
+
+
+def format_sections(title: str, what_it_is: str, do_now: List[str], watch_for: List[str], when_to_see: List[str], extra_notes: Optional[List[str]] = None) -> str:
+    parts = []
+    if title:
+        parts.append(f"**{title}**")
+    if what_it_is:
+        parts.append(f"\n**What it is:**\n{what_it_is}")
+    if do_now:
+        bullets = "\n".join([f"- {item}" for item in do_now])
+        parts.append(f"\n**Do now**\n{bullets}")
+    if watch_for:
+        bullets = "\n".join([f"- {item}" for item in watch_for])
+        parts.append(f"\n**Watch for**\n{bullets}")
+    if when_to_see:
+        bullets = "\n".join([f"- {item}" for item in when_to_see])
+        parts.append(f"\n**When to see a doctor**\n{bullets}")
+    if extra_notes:
+        bullets = "\n".join([f"- {item}" for item in extra_notes])
+        parts.append(f"\n**Notes**\n{bullets}")
+    parts.append(f"\n{DISCLAIMER}")
+    return "\n\n".join(parts)
+
+
+@lru_cache(maxsize=None)
+def render_static(key: str) -> str:
+    """Render a canned answer from ``STATIC_SECTIONS`` once and reuse it."""
+    return format_sections(**STATIC_SECTIONS[key])
+
+
+SPEAKERS = {"user": "You", "assistant": "Care Pal"}
+
+
+@lru_cache(maxsize=2048)
+def message_markdown(role: str, content: str) -> str:
+    """One chat message as a transcript entry, built once per distinct message."""
+    # Quoting keeps a reply's headings and lists from running into the next entry.
+    body = "\n".join(f"> {line}" if line.strip() else ">" for line in content.splitlines())
+    return f"**{SPEAKERS.get(role, role)}:**\n\n{body}"
+
+
+def transcript_markdown(messages: Sequence[Dict[str, str]]) -> str:
+    """Several messages as one markdown block, so older history is a single element to draw."""
+    return "\n\n---\n\n".join(message_markdown(m["role"], m["content"]) for m in messages)
@@ -0,0 +1,192 @@
+"""Completion cache for repeated questions.
+
+Answers are keyed on the normalized question, persona, model, a hash of the
+system prompt and the earlier turns of the conversation. Only short
+conversations are cached: past ``max_history`` earlier messages the reply
+depends too much on context to be worth sharing.
+
+Configured through environment variables:
+
+- ``CAREPAL_CACHE_BACKEND``: ``memory`` (default), ``sqlite`` or ``off``
+- ``CAREPAL_CACHE_PATH``: SQLite file for the ``sqlite`` backend
+- ``CAREPAL_CACHE_SIZE``: maximum number of cached answers
+- ``CAREPAL_CACHE_TTL``: seconds before an answer expires
+- ``CAREPAL_CACHE_MAX_HISTORY``: deepest conversation that is still cached
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s.!?]+$")
+
+
+def normalize_prompt(text: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    text = _WHITESPACE.sub(" ", text.lower()).strip()
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+def prompt_hash(system_prompt: str) -> str:
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def request_key(user_text: str, persona: str, model: str, prompt_id: str,
+                history: List[Dict[str, str]]) -> str:
+    """Hash of everything an AI answer depends on, with the question normalized."""
+    payload = json.dumps(
+        [normalize_prompt(user_text), persona, model, prompt_id, len(history),
+         [(m["role"], m["content"]) for m in history]],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryBackend:
+    """In-process LRU with TTL expiry."""
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, created = entry
+            if time.time() - created > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """LRU with TTL expiry stored in a local SQLite file, so it survives restarts."""
+
+    def __init__(self, path: str, max_entries: int = 1000, ttl: float = 86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class ResponseCache:
+    """Front end over a backend that builds keys and counts hits and misses."""
+
+    def __init__(self, backend, max_history: int = 2):
+        self.backend = backend
+        self.max_history = max_history
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, user_text: str, persona: str, model: str, prompt_id: str,
+                history: List[Dict[str, str]]) -> Optional[str]:
+        """Build the cache key, or return None when the conversation is too long to cache.
+
+        ``prompt_id`` is the system prompt's ``prompt_hash``.
+        """
+        if len(history) > self.max_history:
+            return None
+        return request_key(user_text, persona, model, prompt_id, history)
+
+    def get(self, key: Optional[str]) -> Optional[str]:
+        if key is None:
+            return None
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key: Optional[str], value: str) -> None:
+        if key is not None and value:
+            self.backend.set(key, value)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.backend)}
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def cache_max_history() -> int:
+    """Deepest conversation whose answers are cached, by this cache and the semantic one."""
+    return int(os.getenv("CAREPAL_CACHE_MAX_HISTORY", "2"))
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide cache, or None when caching is turned off."""
+    global _cache
+    backend_name = os.getenv("CAREPAL_CACHE_BACKEND", "memory").lower()
+    if backend_name == "off":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            max_entries = int(os.getenv("CAREPAL_CACHE_SIZE", "1000"))
+            ttl = float(os.getenv("CAREPAL_CACHE_TTL", "86400"))
+            if backend_name == "sqlite":
+                path = os.getenv("CAREPAL_CACHE_PATH", "carepal_cache.sqlite3")
+                backend = SQLiteBackend(path, max_entries=max_entries, ttl=ttl)
+            else:
+                backend = MemoryBackend(max_entries=max_entries, ttl=ttl)
+            _cache = ResponseCache(backend, max_history=cache_max_history())
+        return _cache
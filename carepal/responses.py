@@ -0,0 +1,453 @@
+"""Rule-based answers: emergencies, greetings, refusals and the offline fallback."""
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from carepal.classify import is_greeting, scan_keywords
+from carepal.intents import match_intent
+from carepal.measurements import parse_body
+from carepal.render import DISCLAIMER, render_static
+
+# Ways users introduce themselves. Longer phrases come before the phrases they
+# start with, so "i'm called ana" is read as "i'm called", not "i'm".
+NAME_PHRASES = {
+    "my_name_is": r"my name is",
+    "my_names": r"my name['’]s",
+    "names": r"name['’]s",
+    "you_can_call_me": r"you can call me",
+    "call_me": r"call me",
+    "i_go_by": r"i go by",
+    "im_called": r"i['’]m called",
+    "im": r"i['’]m",
+    "i_am": r"i am",
+}
+# When a message has several introductions, the one earliest in this order gives the name.
+NAME_PRECEDENCE = ("my_name_is", "im", "i_am", "call_me", "im_called", "names", "my_names", "i_go_by",
+                   "you_can_call_me")
+# Words that follow "i'm" / "call me" without being a name ("i'm tired", "call me back").
+NAME_STOP_WORDS = frozenset("""
+    a an the not so very really just also still only too quite pretty kind kinda bit sure glad
+    here there back home now later again anytime please if when what from in on at with about
+    fine good ok okay well great better worse alright unwell ill sick sickly weak tired exhausted
+    sleepy hungry thirsty sad happy stressed anxious worried scared afraid depressed bored lonely
+    nervous overwhelmed confused dizzy nauseous hurt hurting injured bleeding coughing sneezing
+    vomiting sweating cold hot pregnant diabetic asthmatic allergic overweight underweight fat
+    thin skinny vegan vegetarian feeling trying going having getting looking wondering asking
+    thinking planning struggling suffering experiencing starting currently always never new old
+    sorry busy alone interested concerned male female sore itchy achy shaky stuffy sweaty
+    feverish out constantly unable pale obese stuck sunburnt sunburned swollen numb faint queasy
+    breathless aching dying lying maybe
+""".split())
+# "i'm" / "i am" introduce states far more often than names, so a lowercase word
+# after them is only a name when the sentence ends there ("hi i'm ana", "i'm ted,
+# and ...") and it does not look like a state: a stem of four or more letters
+# ending in -ed, -ing or -ish ("i'm dehydrated", "i'm shaking", "i'm feverish").
+# Written capitalized ("I'm Ted and I'm exhausted") it is always taken.
+_STATE_PHRASES = frozenset({"im", "i_am"})
+_STATE_WORD = re.compile(r"[a-z]{4,}(?:ed|ing|ish)")
+_NAME_END = re.compile(r"\s*(?:$|[^\w\s]|and\b)")
+# One scan finds every introduction; the named group that matched says which
+# phrase it was. The leading lookahead on the phrases' first letters lets most
+# positions fail before any alternative is tried.
+NAME_PATTERN = re.compile(
+    "(?=[%s])\\b(?:%s)" % (
+        "".join(sorted({phrase[0] for phrase in NAME_PHRASES.values()})),
+        "|".join(rf"{phrase}\s+(?P<{key}>[a-z]+)\b" for key, phrase in NAME_PHRASES.items()),
+    )
+)
+_NAME_RANK = {key: rank for rank, key in enumerate(NAME_PRECEDENCE)}
+
+
+class NameMatch(NamedTuple):
+    name: str
+    phrase: str  # key in NAME_PHRASES
+
+
+BLOCKLIST_RESPONSES = {
+    "Medication specifics / prescribing": (
+        f"{DISCLAIMER}\n\nI can’t provide prescriptions or dosage instructions. Prescription medicines should only be taken when they are prescribed specifically for you. "
+        "Usually, clinicians choose a medicine and dose based on your age, weight, medical history, allergies, other medicines, and an in-person exam.\n\n"
+        "Safe general steps you can consider: keep a brief symptoms log (start time, severity, what worsens/relieves), rest, hydrate, eat light meals, and use over-the-counter options only as directed on the product label. "
+        "Avoid taking multiple products with the same active ingredient. If symptoms persist, worsen, or you notice red-flag signs, please see a licensed healthcare provider promptly."
+    ),
+    "High-risk domains": (
+        f"{DISCLAIMER}\n\nI’m really sorry you’re going through this. I can’t help with self-harm or life-threatening situations. "
+        "Please seek immediate help: call 911 right now. If you can, reach out to someone you trust nearby. "
+        "If you are in immediate danger, try not to be alone and get urgent help."
+    ),
+    "Diagnostic certainty": (
+        f"{DISCLAIMER}\n\nI can’t provide an exact diagnosis. A clinician would need a physical exam, history, and possibly tests. "
+        "Consider keeping a symptoms log (onset, triggers, what helps) and see a licensed healthcare provider, especially if symptoms persist, worsen, or you notice red-flag signs."
+    ),
+    "Experimental/dangerous": (
+        f"{DISCLAIMER}\n\nI can’t assist with dangerous or invasive procedures. Please do not attempt this at home. "
+        "Keep the area clean, avoid actions that could worsen harm or infection, and seek care from a licensed healthcare professional. "
+        "Call 911 if there is severe bleeding, breathing trouble, or loss of consciousness."
+    ),
+}
+
+NON_HEALTH_RESPONSE = f"""{DISCLAIMER}
+
+I'm a health assistant and can only help with health and wellness questions. 
+
+I can help you with:
+• First aid tips for minor injuries  
+• Common illnesses (colds, headaches, etc.)  
+• Nutrition and hydration advice  
+• Exercise recommendations  
+• Stress management techniques  
+
+How can I help you with your health today?"""
+
+DEFAULT_REFUSAL = f"{DISCLAIMER}\n\nI can't assist with that request. Please consult a licensed healthcare provider."
+
+
+def get_emergency_response(user_input: str) -> str:
+    text = user_input.lower()
+    em_num = "911"
+    
+    if "chest pain" in text or "heart attack" in text:
+        return f"""{DISCLAIMER}
+
+🚨 **CHEST PAIN/HEART ATTACK - EMERGENCY**
+
+**CALL {em_num} IMMEDIATELY!**
+
+**While waiting for help:**
+- Have the person sit down and rest
+- Loosen tight clothing
+- If they have prescribed heart medication (like nitroglycerin), help them take it
+- Stay with them and keep them calm
+- If they become unconscious, start CPR if you know how
+
+**DO NOT:**
+- Drive them to the hospital yourself
+- Give them aspirin unless specifically prescribed
+- Leave them alone
+
+**Time is critical - every minute counts!**"""
+    
+    elif "not breathing" in text or "can't breathe" in text or "breathing trouble" in text:
+        return f"""{DISCLAIMER}
+
+🚨 **BREATHING EMERGENCY**
+
+**CALL {em_num} IMMEDIATELY!**
+
+**While waiting for help:**
+- Check if they're conscious and responsive
+- If unconscious and not breathing, start CPR immediately
+- If conscious but struggling to breathe:
+  - Help them sit upright
+  - Loosen tight clothing around neck/chest
+  - Stay calm and reassure them
+- If they have an inhaler (for asthma), help them use it
+
+**DO NOT:**
+- Panic or rush them
+- Give them anything to eat or drink
+- Leave them alone
+
+**This is a life-threatening emergency!**"""
+    
+    elif "unconscious" in text or "passed out" in text or "fainted" in text:
+        return f"""{DISCLAIMER}
+
+🚨 **UNCONSCIOUS PERSON - EMERGENCY**
+
+**CALL {em_num} IMMEDIATELY!**
+
+**While waiting for help:**
+- Check if they're breathing
+- If breathing: place them on their side (recovery position)
+- If NOT breathing: start CPR immediately
+- Check for pulse
+- Do NOT move them if you suspect spinal injury
+- Stay with them and monitor their breathing
+
+**Recovery Position:**
+- Roll them onto their side
+- Tilt head back slightly
+- Bend top leg to keep them stable
+- This prevents choking if they vomit
+
+**DO NOT:**
+- Try to wake them by shaking
+- Give them anything to eat or drink
+- Leave them alone
+
+**This requires immediate medical attention!**"""
+    
+    elif "severe bleeding" in text or "bleeding heavily" in text or "blood everywhere" in text:
+        return f"""{DISCLAIMER}
+
+🚨 **SEVERE BLEEDING - EMERGENCY**
+
+**CALL {em_num} IMMEDIATELY!**
+
+**While waiting for help:**
+- Apply direct pressure to the wound with clean cloth/towel
+- If bleeding doesn't stop, apply more pressure
+- Elevate the injured area above heart level (if possible)
+- Do NOT remove objects stuck in the wound
+- Keep pressure until help arrives
+
+**If bleeding is from limb:**
+- Apply pressure above the wound (between wound and heart)
+- Use tourniquet only as last resort if bleeding won't stop
+
+**DO NOT:**
+- Remove objects from wound
+- Use tourniquet unless absolutely necessary
+- Panic - stay calm and focused
+
+**Severe blood loss can be fatal quickly!**"""
+    
+    elif "stroke" in text:
+        return f"""{DISCLAIMER}
+
+🚨 **STROKE - EMERGENCY**
+
+**CALL {em_num} IMMEDIATELY!**
+
+**Remember FAST:**
+- **F**ace: Is one side drooping?
+- **A**rms: Can they raise both arms?
+- **S**peech: Is speech slurred or strange?
+- **T**ime: Time is critical - call immediately!
+
+**While waiting for help:**
+- Keep them calm and still
+- Do NOT give them anything to eat or drink
+- Note the time symptoms started
+- If they become unconscious, place in recovery position
+
+**DO NOT:**
+- Drive them to hospital yourself
+- Give them aspirin
+- Wait to see if symptoms improve
+
+**Every minute counts with stroke!**"""
+    
+    elif "choking" in text or "can't swallow" in text:
+        return f"""{DISCLAIMER}
+
+🚨 **CHOKING - EMERGENCY**
+
+**CALL {em_num} IMMEDIATELY!**
+
+**If person is conscious:**
+- Encourage them to cough forcefully
+- If coughing doesn't work, perform Heimlich maneuver
+- Stand behind them, place hands above navel
+- Give quick upward thrusts until object is expelled
+
+**If person is unconscious:**
+- Start CPR immediately
+- Check mouth for visible object (remove if seen)
+- Continue CPR until help arrives
+
+**DO NOT:**
+- Slap them on the back
+- Give them anything to drink
+- Leave them alone
+
+**Choking can be fatal within minutes!**"""
+    
+    elif "severe allergic reaction" in text or "anaphylaxis" in text:
+        return f"""{DISCLAIMER}
+
+🚨 **SEVERE ALLERGIC REACTION - EMERGENCY**
+
+**CALL {em_num} IMMEDIATELY!**
+
+**While waiting for help:**
+- If they have an EpiPen, help them use it immediately
+- Help them lie down and elevate legs
+- Loosen tight clothing
+- Stay with them and monitor breathing
+- If they become unconscious, start CPR
+
+**Signs of severe reaction:**
+- Difficulty breathing or swallowing
+- Swelling of face, lips, tongue, or throat
+- Rapid pulse, dizziness, or fainting
+- Severe rash or hives
+
+**DO NOT:**
+- Give them anything to eat or drink
+- Wait to see if symptoms improve
+- Leave them alone
+
+**This can be life-threatening quickly!**"""
+    
+    else:
+        return f"""{DISCLAIMER}
+
+🚨 **MEDICAL EMERGENCY**
+
+**CALL {em_num} IMMEDIATELY!**
+
+**While waiting for help:**
+- Stay with the person
+- Keep them calm and comfortable
+- Do NOT give them anything to eat or drink
+- Monitor their breathing and consciousness
+- If they become unconscious, place in recovery position
+
+**This requires immediate medical attention!**"""
+
+
+def get_nutrition_advice(user_input: str) -> str:
+    return render_static("nutrition")
+
+
+def get_exercise_tips(user_input: str) -> str:
+    text = user_input.lower()
+    
+    bmi_category = parse_body(user_input).bmi_category
+    
+    if "weight loss" in text or "lose weight" in text or "burn fat" in text:
+        if bmi_category == "overweight" or bmi_category == "obese":
+            return render_static("weight_loss_plan")
+        else:
+            return render_static("weight_management")
+    
+    elif "gain weight" in text or "build muscle" in text or "bulk up" in text:
+        return render_static("muscle_building")
+    
+    elif "cardio" in text or "running" in text or "cycling" in text or "swimming" in text:
+        return render_static("cardio")
+    
+    elif "strength" in text or "weight training" in text or "gym" in text:
+        return render_static("strength_training")
+    
+    elif "beginner" in text or "start" in text or "new to exercise" in text:
+        return render_static("exercise_beginner")
+    
+    else:
+        
+        if bmi_category:
+            return render_static(f"bmi_{bmi_category}")
+        
+        return render_static("exercise_general")
+
+
+def _written_capitalized(user_input: str, text: str, start: int) -> bool:
+    # Lowercasing can change the length of some characters; then the original is not comparable.
+    return len(text) == len(user_input) and user_input[start].isupper()
+
+
+@lru_cache(maxsize=1024)
+def find_name(user_input: str) -> Optional[NameMatch]:
+    """Name the user introduced themselves with ("my name is ...", "call me ..."), and how."""
+    best = None
+    text = user_input.lower()
+    for match in NAME_PATTERN.finditer(text):
+        word = match.group(match.lastgroup)
+        if word in NAME_STOP_WORDS:
+            continue
+        capitalized = _written_capitalized(user_input, text, match.start(match.lastgroup))
+        if match.lastgroup in _STATE_PHRASES and not capitalized:
+            if not _NAME_END.match(text, match.end()) or _STATE_WORD.fullmatch(word):
+                continue
+        if best is None or _NAME_RANK[match.lastgroup] < _NAME_RANK[best.phrase]:
+            best = NameMatch(word.capitalize(), match.lastgroup)
+    return best
+
+
+def match_name(user_input: str) -> Optional[str]:
+    found = find_name(user_input)
+    return found.name if found is not None else None
+
+
+@lru_cache(maxsize=1)
+def _manila_timezone():
+    try:
+        import pytz
+        return pytz.timezone('Asia/Manila')
+    except Exception:
+        # Fall back to local time if pytz is not available
+        return None
+
+
+def get_greeting_response(user_input: str) -> str:
+    name = match_name(user_input)
+    
+    # Use Philippines timezone for consistent greetings
+    current_hour = datetime.now(_manila_timezone()).hour
+    
+    if 5 <= current_hour < 12:
+        time_greeting = "Good morning"
+    elif 12 <= current_hour < 17:
+        time_greeting = "Good afternoon"
+    elif 17 <= current_hour < 21:
+        time_greeting = "Good evening"
+    else:
+        time_greeting = "Hello"
+    
+    if name:
+        return f"""{time_greeting}, {name}! 👋
+
+I'm Your Care Pal, your friendly wellness companion. I can help with:
+
+• First aid tips for minor injuries  
+• Common illnesses (colds, headaches, etc.)  
+• Nutrition/hydration advice  
+• Exercise recommendations based on your weight/height  
+• Stress management techniques  
+
+What can I help you with today, {name}?
+
+{DISCLAIMER}"""
+    else:
+        return f"""{time_greeting}! 👋
+
+I'm Your Care Pal, your friendly wellness companion. I can help with:
+
+• First aid tips for minor injuries  
+• Common illnesses (colds, headaches, etc.)  
+• Nutrition/hydration advice  
+• Exercise recommendations based on your weight/height  
+• Stress management techniques  
+
+What's your name? And what can I help you with today?
+
+{DISCLAIMER}"""
+
+
+def extract_name_from_input(user_input: str) -> Optional[str]:
+    if parse_body(user_input).measurements:
+        return None
+    
+    return match_name(user_input)
+
+
+def local_response(user_input: str, persona: str) -> str:
+    hits = scan_keywords(user_input)
+
+    # Check for non-health questions first
+    if hits.in_table("non_health"):
+        return NON_HEALTH_RESPONSE
+
+    if is_greeting(user_input):
+        return get_greeting_response(user_input)
+
+    if any(word in hits.keywords for word in ["chest pain", "not breathing", "unconscious", "severe bleeding"]):
+        return get_emergency_response(user_input)
+
+    intent = match_intent(hits.in_table("topic"))
+    if intent is not None:
+        return render_static(intent["key"])
+
+    if hits.in_table("nutrition"):
+        return get_nutrition_advice(user_input)
+
+    if hits.in_table("exercise"):
+        return get_exercise_tips(user_input)
+    
+    if parse_body(user_input).measurements:
+        return get_exercise_tips(user_input)
+
+    return render_static("general_wellness")
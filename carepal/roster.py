@@ -0,0 +1,101 @@
+"""BMI bands and exercise plans for a whole roster at once.
+
+The same bands and plan keys as ``get_exercise_tips``, computed with NumPy
+over whole columns instead of one message at a time. Bands and plans are
+kept as integer codes and returned as categoricals. Rows with a missing or
+non-positive weight or height get no band and the general plan.
+
+    python -m carepal.roster students.csv --height-unit cm -o plans.csv
+"""
+import argparse
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from carepal.measurements import BMI_BOUNDS, BMI_CATEGORIES
+
+WEIGHT_UNITS = {"kg": 1.0, "lb": 0.453592}
+HEIGHT_UNITS = {"m": 1.0, "cm": 0.01, "in": 0.0254}
+
+PLAN_KEYS = tuple(f"bmi_{category}" for category in BMI_CATEGORIES) + (
+    "exercise_general", "weight_loss_plan", "weight_management",
+    "muscle_building", "cardio", "strength_training", "exercise_beginner",
+)
+# Goals mirror the keyword branches of get_exercise_tips; weight_loss depends on the band.
+GOAL_PLANS = {
+    "weight_loss": "weight_management",
+    "muscle": "muscle_building",
+    "cardio": "cardio",
+    "strength": "strength_training",
+    "beginner": "exercise_beginner",
+}
+_GOAL_INDEX = {goal: i for i, goal in enumerate(GOAL_PLANS)}
+_GOAL_PLAN_CODES = np.array([PLAN_KEYS.index(plan) for plan in GOAL_PLANS.values()])
+_GENERAL = PLAN_KEYS.index("exercise_general")
+_WEIGHT_LOSS_PLAN = PLAN_KEYS.index("weight_loss_plan")
+_OVERWEIGHT = BMI_CATEGORIES.index("overweight")
+
+
+def bmi_bands(weight_kg: Sequence[float], height_m: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+    """BMI per row and the index of its band in BMI_CATEGORIES; -1 and NaN for invalid rows."""
+    weight = np.asarray(weight_kg, dtype=np.float64)
+    height = np.asarray(height_m, dtype=np.float64)
+    valid = (weight > 0) & (height > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bmi = np.where(valid, weight / (height * height), np.nan)
+    band = np.where(valid, np.searchsorted(BMI_BOUNDS, bmi, side="right"), -1).astype(np.int8)
+    return bmi, band
+
+
+def plan_codes(band: np.ndarray, goal: Optional[Sequence[str]] = None) -> np.ndarray:
+    """Index into PLAN_KEYS per row: the goal's plan if one is given, else the BMI band's."""
+    codes = np.where(band >= 0, band, _GENERAL)
+    if goal is None:
+        return codes
+    # Rosters repeat a handful of goal spellings, so normalize each distinct one once.
+    raw, spellings = pd.factorize(pd.Series(goal, dtype=object))
+    lookup = np.array([_GOAL_INDEX.get(str(g).strip().lower(), -1) for g in spellings] + [-1])
+    goal_codes = lookup[raw]
+    codes = np.where(goal_codes >= 0, _GOAL_PLAN_CODES[goal_codes], codes)
+    weight_loss = (goal_codes == _GOAL_INDEX["weight_loss"]) & (band >= _OVERWEIGHT)
+    return np.where(weight_loss, _WEIGHT_LOSS_PLAN, codes)
+
+
+def classify_roster(roster: pd.DataFrame, weight_col: str = "weight", height_col: str = "height",
+                    weight_unit: str = "kg", height_unit: str = "m",
+                    goal_col: Optional[str] = None) -> pd.DataFrame:
+    """Copy of ``roster`` with ``bmi``, ``bmi_category`` and ``plan_key`` columns added."""
+    if weight_unit not in WEIGHT_UNITS or height_unit not in HEIGHT_UNITS:
+        raise ValueError(f"units must be one of {list(WEIGHT_UNITS)} and {list(HEIGHT_UNITS)}")
+    weight = pd.to_numeric(roster[weight_col], errors="coerce").to_numpy(np.float64) * WEIGHT_UNITS[weight_unit]
+    height = pd.to_numeric(roster[height_col], errors="coerce").to_numpy(np.float64) * HEIGHT_UNITS[height_unit]
+    bmi, band = bmi_bands(weight, height)
+    codes = plan_codes(band, roster[goal_col] if goal_col else None)
+    result = roster.copy()
+    result["bmi"] = np.round(bmi, 1)
+    result["bmi_category"] = pd.Categorical.from_codes(band, categories=BMI_CATEGORIES)
+    result["plan_key"] = pd.Categorical.from_codes(codes, categories=PLAN_KEYS)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("roster", help="CSV with weight and height columns")
+    parser.add_argument("-o", "--output", default="-", help="output CSV (default: stdout)")
+    parser.add_argument("--weight-col", default="weight")
+    parser.add_argument("--height-col", default="height")
+    parser.add_argument("--weight-unit", choices=list(WEIGHT_UNITS), default="kg")
+    parser.add_argument("--height-unit", choices=list(HEIGHT_UNITS), default="m")
+    parser.add_argument("--goal-col", help=f"optional column of goals: {', '.join(GOAL_PLANS)}")
+    args = parser.parse_args()
+    result = classify_roster(pd.read_csv(args.roster), args.weight_col, args.height_col,
+                             args.weight_unit, args.height_unit, args.goal_col)
+    if args.output == "-":
+        print(result.to_csv(index=False), end="")
+    else:
+        result.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
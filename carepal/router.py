@@ -0,0 +1,68 @@
+"""Confidence-scored pre-router: answer FAQ-style questions from the curated content.
+
+A message that names exactly one condition intent ("small cut", "nosebleed",
+"dengue prevention") as whole words (``intents.ROUTE_TRIGGERS``) and nothing that would change the advice is answered
+from that intent's canned sections, with the persona's opening line, without
+calling the AI. Several topics, extra nutrition or exercise questions,
+caveats (pregnancy, children, chronic conditions, symptoms lasting weeks,
+"why" and "X or Y" questions), the intent's own red flags (pus in a cut, a
+stiff neck with a fever) and long messages all lower the confidence.
+Anything below the threshold goes to the AI as before.
+
+Configured through environment variables:
+
+- ``CAREPAL_ROUTER``: ``1`` (default) to answer confident matches locally, ``0`` to send everything to the AI
+- ``CAREPAL_ROUTER_THRESHOLD``: minimum confidence, between 0 and 1
+"""
+import os
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from carepal.classify import scan_keywords
+from carepal.intents import ROUTE_INDEX, matching_intents, red_flags, route_keywords
+from carepal.prompts import PERSONA_LEADS
+from carepal.render import render_static
+
+# Confidence lost per extra topic, per other table hit, per caveat, per red flag and per word past FREE_WORDS.
+EXTRA_TOPIC_PENALTY = 0.4
+OTHER_TABLE_PENALTY = 0.35
+CAVEAT_PENALTY = 0.35
+RED_FLAG_PENALTY = 0.5
+FREE_WORDS = 12
+WORD_PENALTY = 0.03
+
+
+class Route(NamedTuple):
+    key: Optional[str]  # STATIC_SECTIONS key of the best intent, None if nothing matched
+    confidence: float
+
+
+def route(user_input: str) -> Route:
+    """Best curated intent for ``user_input`` and how safely its canned answer fits."""
+    intents = matching_intents(route_keywords(user_input), ROUTE_INDEX)
+    if not intents:
+        return Route(None, 0.0)
+    hits = scan_keywords(user_input)
+    confidence = 1.0 - EXTRA_TOPIC_PENALTY * (len(intents) - 1)
+    confidence -= OTHER_TABLE_PENALTY * sum(1 for table in ("nutrition", "exercise") if hits.in_table(table))
+    confidence -= CAVEAT_PENALTY * len(hits.in_table("caveat"))
+    confidence -= RED_FLAG_PENALTY * len(frozenset().union(*(red_flags(user_input, i["key"]) for i in intents)))
+    confidence -= WORD_PENALTY * max(0, len(user_input.split()) - FREE_WORDS)
+    return Route(intents[0]["key"], round(max(confidence, 0.0), 2))
+
+
+def confident_route(user_input: str) -> Optional[Route]:
+    """The route for ``user_input`` if the router is on and sure enough to skip the AI."""
+    if os.getenv("CAREPAL_ROUTER", "1") != "1":
+        return None
+    found = route(user_input)
+    if found.key is None or found.confidence < float(os.getenv("CAREPAL_ROUTER_THRESHOLD", "0.7")):
+        return None
+    return found
+
+
+@lru_cache(maxsize=None)
+def routed_reply(key: str, persona: str) -> str:
+    """The canned answer for ``key`` with ``persona``'s opening line."""
+    lead = PERSONA_LEADS.get(persona)
+    return f"{lead}\n\n{render_static(key)}" if lead else render_static(key)
@@ -0,0 +1,236 @@
+"""Near-duplicate answer cache over hashed TF-IDF vectors.
+
+Questions are embedded locally with the hashing trick (word unigrams and
+character trigrams), weighted by IDF over the cached questions, and compared
+with cosine similarity in one vectorized NumPy pass. Vectors and metadata sit
+in ``.npy`` files opened as memory maps, so a restart loads the index
+instantly. Emergency and blocklisted questions are never stored or served.
+
+An index directory has one writer: each process takes an exclusive lock on
+``CAREPAL_SEMANTIC_CACHE_DIR`` or, when another worker holds it, on the
+first free ``worker-N`` directory inside it, so every worker keeps an index
+of its own across restarts. Each answer also records a hash of its question,
+and a lookup only returns it if the vector in its slot has the same hash.
+
+Configured through environment variables:
+
+- ``CAREPAL_SEMANTIC_CACHE``: set to ``1`` to enable (off by default)
+- ``CAREPAL_SEMANTIC_CACHE_DIR``: directory for the index files (one subdirectory per extra worker)
+- ``CAREPAL_SEMANTIC_THRESHOLD``: minimum cosine similarity for a hit
+- ``CAREPAL_SEMANTIC_CAPACITY``: number of answers kept (oldest overwritten)
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+from typing import List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks; run a single worker per directory there.
+    fcntl = None
+
+from carepal.classify import is_disallowed, is_emergency
+from carepal.response_cache import normalize_prompt
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+_STOP_WORDS = frozenset([
+    "a", "an", "and", "are", "can", "do", "for", "how", "i", "i'm", "in", "is", "it", "me",
+    "my", "of", "on", "please", "some", "the", "to", "what", "with", "you",
+])
+
+
+def scope_id(*parts: str) -> int:
+    """Stable 63-bit id for the persona/model/prompt and earlier turns an answer belongs to."""
+    digest = hashlib.sha256("\x1f".join(parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little") >> 1
+
+
+def embed(text: str, dim: int) -> np.ndarray:
+    """Sublinear term frequencies of hashed words and character trigrams."""
+    counts = np.zeros(dim, dtype=np.float32)
+    for word in _TOKEN.findall(normalize_prompt(text)):
+        if word not in _STOP_WORDS:
+            counts[zlib.crc32(word.encode("utf-8")) % dim] += 1
+        padded = f"<{word}>"
+        for i in range(len(padded) - 2):
+            counts[zlib.crc32(padded[i:i + 3].encode("utf-8")) % dim] += 1
+    nonzero = counts > 0
+    counts[nonzero] = 1 + np.log(counts[nonzero])
+    return counts
+
+
+def question_id(text: str) -> int:
+    return scope_id(normalize_prompt(text))
+
+
+class SemanticCache:
+    """Fixed-capacity ring of (question vector, scope, answer) entries."""
+
+    def __init__(self, path: Optional[str] = None, dim: int = 1024, capacity: int = 5000,
+                 threshold: float = 0.9):
+        self.dim = dim
+        self.capacity = capacity
+        self.threshold = threshold
+        self.path = path
+        self._lock = threading.Lock()
+        self._answers: List[Optional[str]] = [None] * capacity
+        # Question id each answer was stored for, checked against the slot's id on lookup.
+        self._answer_questions: List[Optional[int]] = [None] * capacity
+        self._count = 0
+        self._next = 0
+        self._lock_file = None
+        if path is None:
+            self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+            self._scopes = np.zeros(capacity, dtype=np.int64)
+            self._questions = np.zeros(capacity, dtype=np.int64)
+        else:
+            self.path = path = self._claim(path)
+            self._vectors = self._open("vectors.npy", np.float32, (capacity, dim))
+            self._scopes = self._open("scopes.npy", np.int64, (capacity,))
+            self._questions = self._open("questions.npy", np.int64, (capacity,))
+            self._load_answers()
+        # Document frequency of each hashed feature over the stored questions.
+        self._df = (self._vectors[:self._count] > 0).sum(axis=0).astype(np.float32)
+        # IDF-weighted row norms only change when an entry is added.
+        self._row_norms: Optional[np.ndarray] = None
+
+    def _claim(self, path: str) -> str:
+        """Lock ``path``, or the first free ``worker-N`` inside it, for this process; returns the one locked."""
+        candidate, n = path, 0
+        while True:
+            os.makedirs(candidate, exist_ok=True)
+            if fcntl is None:
+                return candidate
+            lock_file = open(os.path.join(candidate, "lock"), "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                n += 1
+                candidate = os.path.join(path, f"worker-{n}")
+                continue
+            # Held until the process exits.
+            self._lock_file = lock_file
+            return candidate
+
+    def _open(self, name: str, dtype, shape) -> np.ndarray:
+        file_path = os.path.join(self.path, name)
+        if os.path.exists(file_path):
+            array = np.lib.format.open_memmap(file_path, mode="r+")
+            if array.shape == shape and array.dtype == dtype:
+                return array
+            del array
+        return np.lib.format.open_memmap(file_path, mode="w+", dtype=dtype, shape=shape)
+
+    def _load_answers(self) -> None:
+        # answers.jsonl is an append-only log of (slot, answer) writes; the
+        # last write to a slot wins. meta.json records the ring position.
+        meta_path = os.path.join(self.path, "meta.json")
+        log_path = os.path.join(self.path, "answers.jsonl")
+        if not os.path.exists(meta_path) or not os.path.exists(log_path):
+            return
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("capacity") != self.capacity or meta.get("dim") != self.dim:
+            return
+        writes = 0
+        with open(log_path, encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                self._answers[entry["slot"]] = entry["answer"]
+                self._answer_questions[entry["slot"]] = entry.get("question")
+                writes += 1
+        self._count = meta["count"]
+        self._next = meta["next"]
+        if writes > 2 * self.capacity:
+            with open(log_path + ".tmp", "w", encoding="utf-8") as f:
+                for slot, answer in enumerate(self._answers):
+                    if answer is not None:
+                        f.write(self._log_entry(slot))
+            os.replace(log_path + ".tmp", log_path)
+
+    def _log_entry(self, slot: int) -> str:
+        entry = {"slot": slot, "answer": self._answers[slot], "question": self._answer_questions[slot]}
+        return json.dumps(entry, ensure_ascii=False) + "\n"
+
+    def _persist(self, slot: int) -> None:
+        self._vectors.flush()
+        self._scopes.flush()
+        self._questions.flush()
+        with open(os.path.join(self.path, "answers.jsonl"), "a", encoding="utf-8") as f:
+            f.write(self._log_entry(slot))
+        meta_path = os.path.join(self.path, "meta.json")
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"capacity": self.capacity, "dim": self.dim, "count": self._count, "next": self._next}, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    @staticmethod
+    def cacheable(text: str) -> bool:
+        return not is_emergency(text) and not is_disallowed(text)
+
+    def lookup(self, text: str, scope: int) -> Optional[str]:
+        """Return the stored answer most similar to ``text`` if it clears the threshold."""
+        if not self.cacheable(text):
+            return None
+        with self._lock:
+            n = self._count
+            if n == 0:
+                return None
+            idf = np.log((1 + n) / (1 + self._df)) + 1
+            idf_sq = idf * idf
+            query = embed(text, self.dim)
+            query_norm = np.sqrt(query @ (query * idf_sq))
+            if query_norm == 0:
+                return None
+            vectors = self._vectors[:n]
+            if self._row_norms is None:
+                self._row_norms = np.sqrt(np.einsum("ij,ij,j->i", vectors, vectors, idf_sq))
+            sims = (vectors @ (query * idf_sq)) / np.maximum(self._row_norms * query_norm, 1e-12)
+            sims[self._scopes[:n] != scope] = -1
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold or self._answer_questions[best] != int(self._questions[best]):
+                return None
+            return self._answers[best]
+
+    def add(self, text: str, scope: int, answer: str) -> None:
+        if not answer or not self.cacheable(text):
+            return
+        vector = embed(text, self.dim)
+        with self._lock:
+            slot = self._next
+            if self._count == self.capacity:
+                self._df -= self._vectors[slot] > 0
+            self._vectors[slot] = vector
+            self._scopes[slot] = scope
+            self._questions[slot] = self._answer_questions[slot] = question_id(text)
+            self._answers[slot] = answer
+            self._df += vector > 0
+            self._next = (slot + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+            self._row_norms = None
+            if self.path is not None:
+                self._persist(slot)
+
+
+_semantic_cache: Optional[SemanticCache] = None
+_semantic_lock = threading.Lock()
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """Return the process-wide semantic cache, or None unless it is enabled."""
+    global _semantic_cache
+    if os.getenv("CAREPAL_SEMANTIC_CACHE", "0") != "1":
+        return None
+    with _semantic_lock:
+        if _semantic_cache is None:
+            _semantic_cache = SemanticCache(
+                path=os.getenv("CAREPAL_SEMANTIC_CACHE_DIR", "carepal_semantic_cache"),
+                capacity=int(os.getenv("CAREPAL_SEMANTIC_CAPACITY", "5000")),
+                threshold=float(os.getenv("CAREPAL_SEMANTIC_THRESHOLD", "0.9")),
+            )
+        return _semantic_cache
@@ -0,0 +1,240 @@
+"""Server-side conversation store, so a browser session only keeps its latest turns.
+
+Each conversation is a small record (user name, pending name acknowledgment,
+message count) plus its messages, stored compressed. The Streamlit app keeps
+only the newest ``CAREPAL_SESSION_RESIDENT`` messages in ``st.session_state``
+and reads older ones from here when they are asked for. Conversations idle
+for longer than ``CAREPAL_SESSION_IDLE`` seconds are evicted; the ``memory``
+backend also drops the least recently used ones past ``CAREPAL_SESSION_MAX``.
+With the ``sqlite`` backend a conversation survives a server restart and is
+resumed from the ``session`` id in the page URL.
+
+Configured through environment variables:
+
+- ``CAREPAL_SESSION_BACKEND``: ``memory`` (default) or ``sqlite``
+- ``CAREPAL_SESSION_PATH``: SQLite file for the ``sqlite`` backend
+- ``CAREPAL_SESSION_MAX``: conversations kept by the ``memory`` backend
+- ``CAREPAL_SESSION_IDLE``: seconds without activity before a conversation is evicted
+- ``CAREPAL_SESSION_RESIDENT``: messages kept in the browser session
+"""
+import os
+import secrets
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# Messages are stored as (role code, compressed content).
+_ROLES = {"user": "u", "assistant": "a"}
+_ROLE_NAMES = {code: role for role, code in _ROLES.items()}
+
+
+class SessionRecord(NamedTuple):
+    user_name: Optional[str]
+    name_acknowledgment: Optional[str]
+    message_count: int
+    updated: float
+
+
+def new_session_id() -> str:
+    return secrets.token_urlsafe(16)
+
+
+def _pack(message: Dict[str, str]) -> Tuple[str, bytes]:
+    return _ROLES[message["role"]], zlib.compress(message["content"].encode("utf-8"))
+
+
+def _unpack(role: str, content: bytes) -> Dict[str, str]:
+    return {"role": _ROLE_NAMES[role], "content": zlib.decompress(content).decode("utf-8")}
+
+
+class MemorySessionStore:
+    """In-process LRU of conversations with idle eviction."""
+
+    def __init__(self, max_sessions: int = 10000, idle_seconds: float = 86400):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        # session id -> [user_name, name_acknowledgment, updated, packed messages]
+        self._sessions: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, session_id: str) -> Optional[list]:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        if time.time() - entry[2] > self.idle_seconds:
+            del self._sessions[session_id]
+            return None
+        return entry
+
+    def load(self, session_id: str) -> Optional[SessionRecord]:
+        with self._lock:
+            entry = self._get(session_id)
+            if entry is None:
+                return None
+            entry[2] = time.time()
+            self._sessions.move_to_end(session_id)
+            return SessionRecord(entry[0], entry[1], len(entry[3]), entry[2])
+
+    def messages(self, session_id: str, start: int = 0, end: Optional[int] = None) -> List[Dict[str, str]]:
+        """Messages ``start`` to ``end`` (by position in the conversation), oldest first."""
+        with self._lock:
+            entry = self._get(session_id)
+            packed = entry[3][start:end] if entry is not None else []
+        return [_unpack(role, content) for role, content in packed]
+
+    def append(self, session_id: str, messages: Sequence[Dict[str, str]], user_name: Optional[str] = None,
+               name_acknowledgment: Optional[str] = None) -> int:
+        """Add ``messages`` and save the session fields; returns the new message count."""
+        packed = [_pack(m) for m in messages]
+        now = time.time()
+        with self._lock:
+            entry = self._get(session_id)
+            if entry is None:
+                entry = self._sessions[session_id] = [None, None, now, []]
+            entry[0], entry[1], entry[2] = user_name, name_acknowledgment, now
+            entry[3].extend(packed)
+            self._sessions.move_to_end(session_id)
+            self._evict(now)
+            return len(entry[3])
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _evict(self, now: float) -> None:
+        # Most recently used last, so idle sessions gather at the front.
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest[2] <= self.idle_seconds and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+
+    def evict_idle(self) -> None:
+        with self._lock:
+            self._evict(time.time())
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteSessionStore:
+    """Conversations in a local SQLite file, so they survive restarts."""
+
+    def __init__(self, path: str, idle_seconds: float = 86400):
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._last_eviction = 0.0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, user_name TEXT, name_acknowledgment TEXT, "
+                "message_count INTEGER NOT NULL, updated REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS session_messages ("
+                "session_id TEXT NOT NULL, position INTEGER NOT NULL, role TEXT NOT NULL, content BLOB NOT NULL, "
+                "PRIMARY KEY (session_id, position)) WITHOUT ROWID"
+            )
+
+    def load(self, session_id: str) -> Optional[SessionRecord]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT user_name, name_acknowledgment, message_count, updated FROM sessions WHERE id = ?",
+                (session_id,),
+            ).fetchone()
+            if row is None or now - row[3] > self.idle_seconds:
+                return None
+            self._conn.execute("UPDATE sessions SET updated = ? WHERE id = ?", (now, session_id))
+            return SessionRecord(row[0], row[1], row[2], now)
+
+    def messages(self, session_id: str, start: int = 0, end: Optional[int] = None) -> List[Dict[str, str]]:
+        """Messages ``start`` to ``end`` (by position in the conversation), oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content FROM session_messages WHERE session_id = ? AND position >= ? AND position < ? "
+                "ORDER BY position",
+                (session_id, start, end if end is not None else 2 ** 62),
+            ).fetchall()
+        return [_unpack(role, content) for role, content in rows]
+
+    def append(self, session_id: str, messages: Sequence[Dict[str, str]], user_name: Optional[str] = None,
+               name_acknowledgment: Optional[str] = None) -> int:
+        """Add ``messages`` and save the session fields; returns the new message count."""
+        packed = [_pack(m) for m in messages]
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT message_count, updated FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is not None and now - row[1] > self.idle_seconds:
+                self._delete(session_id)
+                row = None
+            count = row[0] if row is not None else 0
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO session_messages (session_id, position, role, content) VALUES (?, ?, ?, ?)",
+                [(session_id, count + i, role, content) for i, (role, content) in enumerate(packed)],
+            )
+            count += len(packed)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, user_name, name_acknowledgment, message_count, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session_id, user_name, name_acknowledgment, count, now),
+            )
+            # Sweeping the whole table is not worth doing on every write.
+            if now - self._last_eviction > 60:
+                self._last_eviction = now
+                self._evict(now)
+            return count
+
+    def _delete(self, session_id: str) -> None:
+        self._conn.execute("DELETE FROM session_messages WHERE session_id = ?", (session_id,))
+        self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def delete(self, session_id: str) -> None:
+        with self._lock, self._conn:
+            self._delete(session_id)
+
+    def _evict(self, now: float) -> None:
+        cutoff = now - self.idle_seconds
+        self._conn.execute(
+            "DELETE FROM session_messages WHERE session_id IN (SELECT id FROM sessions WHERE updated < ?)", (cutoff,)
+        )
+        self._conn.execute("DELETE FROM sessions WHERE updated < ?", (cutoff,))
+
+    def evict_idle(self) -> None:
+        with self._lock, self._conn:
+            self._evict(time.time())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def resident_messages() -> int:
+    """How many of the newest messages a browser session keeps in memory."""
+    return int(os.getenv("CAREPAL_SESSION_RESIDENT", "40"))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """Return the process-wide session store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            idle_seconds = float(os.getenv("CAREPAL_SESSION_IDLE", "86400"))
+            if os.getenv("CAREPAL_SESSION_BACKEND", "memory").lower() == "sqlite":
+                _store = SQLiteSessionStore(os.getenv("CAREPAL_SESSION_PATH", "carepal_sessions.sqlite3"),
+                                            idle_seconds=idle_seconds)
+            else:
+                _store = MemorySessionStore(int(os.getenv("CAREPAL_SESSION_MAX", "10000")), idle_seconds)
+        return _store
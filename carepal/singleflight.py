@@ -0,0 +1,134 @@
+"""Single-flight coalescing of identical AI requests.
+
+When many sessions ask the same thing at once (a class clicking the same
+sidebar example), only the first request goes upstream; the others wait for
+it and share its answer. Calls are keyed on the normalized question, persona,
+model, system prompt hash and earlier turns, so only requests that would get
+the same answer are merged. The registry is process-wide and thread-safe, so
+Streamlit script threads and the API's event loop share it.
+
+A streamed call is streamed to the caller that made it; callers that joined
+it get the whole answer in one piece when it is done. If the call fails,
+every caller gets the error.
+
+Set ``CAREPAL_COALESCE=0`` to turn it off.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+from carepal import metrics
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self.calls = 0
+        self.shared = 0
+
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        """The call in flight for ``key`` and whether the caller has to make it."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                metrics.record_coalesced()
+                return future, False
+            future = self._calls[key] = Future()
+            self.calls += 1
+            return future, True
+
+    def _settle(self, key: str, future: Future, result: Optional[str] = None,
+                error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            del self._calls[key]
+        if error is not None and not isinstance(error, Exception):
+            # Cancelled or abandoned by its caller; the callers sharing it just see a failed call.
+            error = RuntimeError("coalesced request did not finish")
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def do(self, key: Optional[str], fn: Callable[[], str]) -> str:
+        """``fn()``, or the result of the identical call already in flight."""
+        if key is None:
+            return fn()
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as exc:
+            self._settle(key, future, error=exc)
+            raise
+        self._settle(key, future, result)
+        return result
+
+    async def ado(self, key: Optional[str], fn: Callable[[], Awaitable[str]]) -> str:
+        if key is None:
+            return await fn()
+        future, leader = self._join(key)
+        if not leader:
+            # Shielded so a caller that gives up does not cancel the call for the others.
+            return await asyncio.shield(asyncio.wrap_future(future))
+        try:
+            result = await fn()
+        except BaseException as exc:
+            self._settle(key, future, error=exc)
+            raise
+        self._settle(key, future, result)
+        return result
+
+    def stream(self, key: Optional[str], fn: Callable[[], Iterator[str]]) -> Iterator[str]:
+        """Chunks of ``fn()``, or the whole answer of the identical call in flight as one chunk."""
+        if key is None:
+            yield from fn()
+            return
+        future, leader = self._join(key)
+        if not leader:
+            yield future.result()
+            return
+        parts = []
+        try:
+            for chunk in fn():
+                parts.append(chunk)
+                yield chunk
+        except BaseException as exc:
+            # Also reached when the caller stops reading early.
+            self._settle(key, future, error=exc)
+            raise
+        self._settle(key, future, "".join(parts))
+
+    async def astream(self, key: Optional[str], fn: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        if key is None:
+            async for chunk in fn():
+                yield chunk
+            return
+        future, leader = self._join(key)
+        if not leader:
+            yield await asyncio.shield(asyncio.wrap_future(future))
+            return
+        parts = []
+        try:
+            async for chunk in fn():
+                parts.append(chunk)
+                yield chunk
+        except BaseException as exc:
+            self._settle(key, future, error=exc)
+            raise
+        self._settle(key, future, "".join(parts))
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+LLM_FLIGHTS = SingleFlight()
+
+
+def coalescing_enabled() -> bool:
+    return os.getenv("CAREPAL_COALESCE", "1") == "1"
@@ -0,0 +1,145 @@
+"""Speculative replies: the AI and the rule-based answer race against a deadline.
+
+With ``CAREPAL_SPECULATIVE=1`` the AI request is started first and the
+rule-based answer is prepared while it runs. If the AI has not produced its
+first token within ``CAREPAL_SPECULATIVE_DEADLINE`` seconds the user gets
+the rule-based answer, so the wait before something is shown never exceeds
+the deadline. The AI request is not cancelled: when it finishes its answer
+is cached for the next time the question comes up. The turn itself is over
+once the rule-based answer is shown.
+
+Configured through environment variables:
+
+- ``CAREPAL_SPECULATIVE``: ``1`` to enable, ``0`` (default) to wait for the AI as usual
+- ``CAREPAL_SPECULATIVE_DEADLINE``: seconds to wait for the AI's first token
+- ``CAREPAL_SPECULATIVE_WORKERS``: pooled threads reading AI streams for the Streamlit app;
+  streams started while all of them are busy get a thread of their own
+"""
+import asyncio
+import os
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+_END = object()
+
+
+def speculation_deadline() -> Optional[float]:
+    """Seconds to wait for the AI's first token, or None when speculation is off."""
+    if os.getenv("CAREPAL_SPECULATIVE", "0") != "1":
+        return None
+    return float(os.getenv("CAREPAL_SPECULATIVE_DEADLINE", "4"))
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_pooled = 0
+
+
+def _release(_future: Future) -> None:
+    global _pooled
+    with _executor_lock:
+        _pooled -= 1
+
+
+def _start(fn: Callable[..., Optional[str]], *args) -> Future:
+    """Run ``fn`` on the shared pool, or on a thread of its own when every pooled thread is busy.
+
+    A stream queued behind others would miss its deadline before it even started.
+    """
+    global _executor, _pooled
+    with _executor_lock:
+        workers = int(os.getenv("CAREPAL_SPECULATIVE_WORKERS", "8"))
+        if _executor is None:
+            _executor = ThreadPoolExecutor(workers, thread_name_prefix="carepal-speculative")
+        pooled = _pooled < workers
+        if pooled:
+            _pooled += 1
+    if pooled:
+        future = _executor.submit(fn, *args)
+        future.add_done_callback(_release)
+        return future
+    future = Future()
+
+    def run() -> None:
+        try:
+            future.set_result(fn(*args))
+        except BaseException as exc:
+            future.set_exception(exc)
+
+    threading.Thread(target=run, name="carepal-speculative-overflow", daemon=True).start()
+    return future
+
+
+class Prefetch:
+    """Reads ``chunks`` on a worker thread so the caller can wait for the first one with a timeout.
+
+    Iterating yields the chunks in order and re-raises the stream's error, if any.
+    ``future`` resolves to the whole answer, or None if the stream failed.
+    """
+
+    def __init__(self, chunks: Iterator[str]):
+        self._queue: "queue.Queue" = queue.Queue()
+        self._head = None
+        self.future = _start(self._pump, chunks)
+
+    def _pump(self, chunks: Iterator[str]) -> Optional[str]:
+        parts = []
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                self._queue.put(chunk)
+        except Exception as exc:
+            self._queue.put(exc)
+            return None
+        finally:
+            self._queue.put(_END)
+        return "".join(parts)
+
+    def wait_first(self, timeout: float) -> bool:
+        """True once the first chunk, an error or the end of the stream has arrived."""
+        if self._head is None:
+            try:
+                self._head = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                return False
+        return True
+
+    def __iter__(self) -> Iterator[str]:
+        while True:
+            if self._head is not None:
+                item, self._head = self._head, None
+            else:
+                item = self._queue.get()
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+
+class AsyncPrefetch:
+    """Collects ``chunks`` in a task; ``wait_first`` waits for the first one with a timeout."""
+
+    def __init__(self, chunks: AsyncIterator[str]):
+        self._started = asyncio.Event()
+        self.task = asyncio.ensure_future(self._collect(chunks))
+
+    async def _collect(self, chunks: AsyncIterator[str]) -> str:
+        parts = []
+        try:
+            async for chunk in chunks:
+                parts.append(chunk)
+                self._started.set()
+        finally:
+            self._started.set()
+        return "".join(parts)
+
+    async def wait_first(self, timeout: float) -> bool:
+        """True once the first chunk, an error or the end of the stream has arrived."""
+        try:
+            await asyncio.wait_for(self._started.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
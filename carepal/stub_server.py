@@ -0,0 +1,168 @@
+"""OpenAI-compatible stub of ``/v1/chat/completions`` for local testing.
+
+Point the app at it with ``OPENAI_BASE_URL=http://127.0.0.1:8765/v1`` and any
+``OPENAI_API_KEY``. It can add latency and fail the first N requests, which
+makes timeouts, retries and fallbacks reproducible without the real API.
+
+    python -m carepal.stub_server --port 8765 --delay 0.5 --fail-first 2
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+
+
+class StubState:
+    def __init__(self, reply: str, delay: float, chunk_delay: float, fail_first: int, fail_status: int):
+        self.reply = reply
+        self.delay = delay
+        self.chunk_delay = chunk_delay
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.requests = 0
+        self.seen_prompts = set()
+        self.lock = threading.Lock()
+
+    def usage(self, messages: list) -> dict:
+        """Word counts as tokens; a system prompt seen before counts as cached, like a provider's prefix cache."""
+        prompt_tokens = sum(len(m.get("content", "").split()) for m in messages)
+        completion_tokens = len(self.reply.split())
+        cached_tokens = 0
+        if messages and messages[0].get("role") == "system":
+            with self.lock:
+                if messages[0]["content"] in self.seen_prompts:
+                    cached_tokens = len(messages[0]["content"].split())
+                self.seen_prompts.add(messages[0]["content"])
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+
+
+def _make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Buffer writes so headers and body leave in one packet; handle_one_request flushes.
+        wbufsize = -1
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                self._send_json(200, {"requests": state.requests})
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", "0"))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+            with state.lock:
+                state.requests += 1
+                number = state.requests
+            time.sleep(state.delay)
+            if number <= state.fail_first:
+                self._send_json(state.fail_status, {"error": {"message": "stub failure", "type": "server_error"}})
+                return
+            model = request.get("model", "stub")
+            usage = state.usage(request.get("messages", []))
+            if request.get("stream"):
+                include_usage = (request.get("stream_options") or {}).get("include_usage", False)
+                self._stream(model, usage if include_usage else None)
+                return
+            self._send_json(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": state.reply},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+
+        def _stream(self, model: str, usage: Optional[dict] = None) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for word in state.reply.split(" "):
+                chunk = {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(state.chunk_delay)
+            if usage is not None:
+                chunk = {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [],
+                    "usage": usage,
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+    return Handler
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Bursts of concurrent clients overflow the default backlog of 5.
+    request_queue_size = 256
+
+
+def start_stub_server(port: int = 0, reply: str = "This is a stub reply. Stay healthy!", delay: float = 0.0,
+                      chunk_delay: float = 0.0, fail_first: int = 0,
+                      fail_status: int = 503) -> Tuple[ThreadingHTTPServer, StubState]:
+    """Serve in a background thread; ``port=0`` picks a free port (see ``server.server_port``)."""
+    state = StubState(reply, delay, chunk_delay, fail_first, fail_status)
+    server = _StubHTTPServer(("127.0.0.1", port), _make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--reply", default="This is a stub reply. Stay healthy!")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before each response starts")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="seconds between streamed chunks")
+    parser.add_argument("--fail-first", type=int, default=0, help="fail this many requests before succeeding")
+    parser.add_argument("--fail-status", type=int, default=503)
+    args = parser.parse_args()
+    server, _ = start_stub_server(args.port, args.reply, args.delay, args.chunk_delay, args.fail_first, args.fail_status)
+    print(f"Stub OpenAI API on http://127.0.0.1:{server.server_port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
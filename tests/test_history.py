@@ -0,0 +1,14 @@
+from carepal.history import count_tokens
+
+
+def test_fallback_count_does_not_undercount_long_words(monkeypatch):
+    import carepal.history as history
+    monkeypatch.setattr(history, "_encoding", lambda: None)
+    count_tokens.cache_clear()
+    try:
+        # o200k_base splits these into several tokens each.
+        assert count_tokens("malunggay") >= 3
+        assert count_tokens("nilalagnat ako") >= 5
+        assert count_tokens("How do I sleep better?") >= 6
+    finally:
+        count_tokens.cache_clear()
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("openai")
+
+from carepal.breaker import CLOSED, BreakerConfig, CircuitBreaker
+from carepal.llm import GatewayConfig, LLMGateway
+from carepal.stub_server import start_stub_server
+
+MESSAGES = [{"role": "user", "content": "how do I sleep better"}]
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    server, _ = start_stub_server(reply="Keep a regular bedtime and skip late coffee.")
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    config = GatewayConfig(base_url=f"http://127.0.0.1:{server.server_port}/v1")
+    yield LLMGateway(config, CircuitBreaker(BreakerConfig(min_calls=2)))
+    server.shutdown()
+
+
+def test_streams_closed_early_do_not_open_the_circuit(gateway):
+    for _ in range(6):
+        stream = gateway.stream_chat(MESSAGES, "gpt-4o-mini")
+        next(stream)
+        stream.close()
+    assert gateway.breaker.state == CLOSED
+    assert "".join(gateway.stream_chat(MESSAGES, "gpt-4o-mini"))
+
+
+def test_async_streams_closed_early_do_not_open_the_circuit(gateway):
+    async def read_first():
+        stream = gateway.astream_chat(MESSAGES, "gpt-4o-mini")
+        await stream.__anext__()
+        await stream.aclose()
+
+    async def main():
+        for _ in range(6):
+            await read_first()
+
+    asyncio.run(main())
+    assert gateway.breaker.state == CLOSED
@@ -0,0 +1,48 @@
+import pytest
+
+from carepal.responses import extract_name_from_input, match_name
+
+
+@pytest.mark.parametrize("message", [
+    "I'm dehydrated",
+    "I am constipated",
+    "I'm bloated",
+    "I'm feverish",
+    "i'm sore all over",
+    "I'm itchy",
+    "I'm shaking",
+    "I'm recovering from flu",
+    "i'm tired",
+    "I'm out of breath",
+    "I'm constantly tired",
+    "I'm unable to sleep",
+    "I'm pale",
+    "I'm obese",
+    "I'm stuck",
+    "I'm sunburnt",
+    "call me maybe",
+])
+def test_states_are_not_names(message):
+    assert match_name(message) is None
+    assert extract_name_from_input(message) is None
+
+
+@pytest.mark.parametrize("message, name", [
+    ("I'm Ana", "Ana"),
+    ("i'm ana", "Ana"),
+    ("I'm Ted and I have a headache", "Ted"),
+    ("I am Ming", "Ming"),
+    ("my name is fred", "Fred"),
+    ("I'm shaking, my name is Ben", "Ben"),
+    ("i'm ted", "Ted"),
+    ("hi i'm ming", "Ming"),
+    ("i'm fred.", "Fred"),
+    ("i'm ching and my throat hurts", "Ching"),
+    ("i'm called bob", "Bob"),
+])
+def test_introductions_give_the_name(message, name):
+    assert match_name(message) == name
+
+
+def test_i_am_outranks_call_me_as_before():
+    assert match_name("call me Bob, I'm Robert") == "Robert"
@@ -0,0 +1,52 @@
+import pytest
+
+from carepal.ratelimit import RateLimitConfig, RateLimited, RateLimiter, max_request_tokens
+
+
+def test_idle_session_admits_a_full_window_request_at_once():
+    config = RateLimitConfig.from_env()
+    tokens = max_request_tokens()
+    assert config.max_request_tokens == tokens
+    assert RateLimiter(config).reserve(tokens, "long-chat") == 0.0
+
+
+def test_flooding_session_is_shed_without_taking_quota():
+    limiter = RateLimiter(RateLimitConfig(session_rpm=6, burst=10, max_wait=1))
+    assert limiter.reserve(100, "flood") == 0.0
+    with pytest.raises(RateLimited):
+        limiter.reserve(100, "flood")
+    assert limiter.shed["session"] == 1
+    assert limiter.reserve(100, "calm") == 0.0
+
+
+def test_session_over_quota_does_not_shed_the_callers_it_would_share_with(monkeypatch):
+    import asyncio
+
+    import carepal.pipeline as pipeline
+    import carepal.ratelimit as ratelimit
+
+    class Gateway:
+        calls = 0
+
+        async def achat(self, messages, model):
+            Gateway.calls += 1
+            await asyncio.sleep(0.05)
+            return "answer"
+
+    limiter = RateLimiter(RateLimitConfig(session_rpm=6, burst=10, max_wait=1))
+    monkeypatch.setenv("CAREPAL_RATE_LIMIT", "1")
+    monkeypatch.setattr(ratelimit, "_limiter", limiter)
+    monkeypatch.setattr(pipeline, "get_gateway", Gateway)
+    messages = [{"role": "user", "content": "Tips to relieve a cold"}]
+    limiter.reserve(100, "flood")
+
+    async def burst():
+        return await asyncio.gather(
+            *(pipeline.aask_ai("same-question", session, messages, "m") for session in ("flood", "a", "b")),
+            return_exceptions=True,
+        )
+
+    flood, first, second = asyncio.run(burst())
+    assert isinstance(flood, RateLimited)
+    assert first == second == "answer"
+    assert Gateway.calls == 1
@@ -0,0 +1,44 @@
+import pytest
+
+from carepal.router import confident_route, route
+
+
+@pytest.mark.parametrize("message", [
+    "I have acute back pain",
+    "heartburn",
+    "what is a burning sensation when I pee",
+    "my cold hands and feet",
+    "I need a shortcut to school",
+    "I drank a cold beer and now my tooth hurts",
+    "is a cold shower good",
+])
+def test_trigger_inside_other_words_does_not_route(message):
+    assert route(message).key is None
+    assert confident_route(message) is None
+
+
+@pytest.mark.parametrize("message, key", [
+    ("Tips to relieve a cold", "cold"),
+    ("I think I caught a cold", "cold"),
+    ("First aid for a small cut", "cut"),
+    ("I burned my hand on the stove", "burn"),
+    ("dengue prevention", "dengue"),
+    ("panic attacks at night", "stress"),
+])
+def test_whole_word_triggers_route(message, key):
+    found = confident_route(message)
+    assert found is not None and found.key == key
+
+
+def test_caveat_lowers_confidence():
+    assert confident_route("Tips to relieve a cold for my baby") is None
+
+
+@pytest.mark.parametrize("message", [
+    "I have a fever and a stiff neck and rash",
+    "my wound smells and has pus",
+    "headache and blurry vision since I hit my head",
+])
+def test_red_flags_send_the_message_to_the_ai(message):
+    assert route(message).key is not None
+    assert confident_route(message) is None
@@ -0,0 +1,63 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from carepal.pipeline import cache_slot, cached_reply, remember_reply
+
+
+@pytest.fixture
+def caches(monkeypatch, tmp_path):
+    import carepal.response_cache as response_cache
+    import carepal.semantic_cache as semantic_cache
+    monkeypatch.setenv("CAREPAL_CACHE_BACKEND", "memory")
+    monkeypatch.setenv("CAREPAL_SEMANTIC_CACHE", "1")
+    monkeypatch.setenv("CAREPAL_SEMANTIC_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(response_cache, "_cache", None)
+    monkeypatch.setattr(semantic_cache, "_semantic_cache", None)
+
+
+def _messages(*turns):
+    return [{"role": "system", "content": "prompt"}] + [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": text} for i, text in enumerate(turns)
+    ]
+
+
+def test_follow_up_is_not_served_from_another_conversation(caches):
+    asked, paraphrase = "How long does the swelling last", "how long does swelling last"
+    bite = _messages("I got stung by a bee", "Remove the stinger and apply a cold pack.", asked)
+    remember_reply(cache_slot(asked, "Clinic Nurse", "gpt-4o-mini", "p", bite), asked, "Bee sting swelling lasts a day.")
+
+    ankle = _messages("I sprained my ankle", "Rest, ice and raise it.", paraphrase)
+    other = cache_slot(paraphrase, "Clinic Nurse", "gpt-4o-mini", "p", ankle)
+    assert cached_reply(other, paraphrase) is None
+
+    again = _messages("I got stung by a bee", "Remove the stinger and apply a cold pack.", paraphrase)
+    same = cache_slot(paraphrase, "Clinic Nurse", "gpt-4o-mini", "p", again)
+    assert cached_reply(same, paraphrase) == "Bee sting swelling lasts a day."
+
+
+def test_semantic_cache_works_without_the_exact_cache(caches, monkeypatch):
+    monkeypatch.setenv("CAREPAL_CACHE_BACKEND", "off")
+    asked, paraphrase = "How long does the swelling last", "how long does swelling last"
+    remember_reply(cache_slot(asked, "Clinic Nurse", "gpt-4o-mini", "p", _messages(asked)), asked, "About a day.")
+    slot = cache_slot(paraphrase, "Clinic Nurse", "gpt-4o-mini", "p", _messages(paraphrase))
+    assert slot.response_cache is None
+    assert cached_reply(slot, paraphrase) == "About a day."
+
+
+def test_workers_sharing_a_directory_keep_separate_indexes(tmp_path):
+    from carepal.semantic_cache import SemanticCache
+    a, b = SemanticCache(str(tmp_path)), SemanticCache(str(tmp_path))
+    assert a.path != b.path
+    a.add("how do i treat a bee sting", 1, "Scrape out the stinger.")
+    b.add("what helps with sunburn on my back", 1, "Cool showers and aloe.")
+    assert a.lookup("what helps with sunburn on my back", 1) is None
+    assert b.lookup("what helps with sunburn on my back", 1) == "Cool showers and aloe."
+
+
+def test_answer_stored_for_another_question_is_not_served(tmp_path):
+    from carepal.semantic_cache import SemanticCache
+    cache = SemanticCache(str(tmp_path))
+    cache.add("how do i treat a bee sting", 1, "Scrape out the stinger.")
+    cache._questions[0] = 0
+    assert cache.lookup("how do i treat a bee sting", 1) is None
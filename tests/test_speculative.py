@@ -0,0 +1,31 @@
+import threading
+
+from carepal.speculative import Prefetch
+
+
+def test_stream_is_not_queued_behind_busy_workers(monkeypatch):
+    monkeypatch.setenv("CAREPAL_SPECULATIVE_WORKERS", "1")
+    release = threading.Event()
+
+    def stuck():
+        release.wait(5)
+        yield "late"
+
+    blocked = [Prefetch(stuck()) for _ in range(2)]
+    try:
+        fresh = Prefetch(iter(["Hello", " there"]))
+        assert fresh.wait_first(1.0)
+        assert fresh.future.result(1.0) == "Hello there"
+    finally:
+        release.set()
+    assert [p.future.result(5) for p in blocked] == ["late", "late"]
+
+
+def test_failed_stream_resolves_to_none():
+    def broken():
+        yield "partial"
+        raise RuntimeError("upstream failed")
+
+    pending = Prefetch(broken())
+    assert pending.future.result(5) is None
+    assert pending.wait_first(1.0)